@@ -0,0 +1,364 @@
+"""
+Banc d'essai de latence du configurateur.
+
+Pour une série de catalogues (le catalogue réel, puis des catalogues
+synthétiques de 20 à plus de 100 variables et plusieurs milliers de règles,
+au format de catalogue.json), on rejoue des séquences de clics et on mesure
+pour chaque moteur :
+
+- la latence de propagation (p50, p95, p99, moyenne) et le débit ;
+- le nombre de résolutions CP-SAT par requête ;
+- le temps et la mémoire de construction du moteur (tracemalloc) ;
+- pour CP-SAT, la latence de `solve` (objectif « cheapest »).
+
+Moteurs : `table` (bitset, si le catalogue est assez petit), `gac`
+(propagation GAC + recherche bornée) et `cpsat`. Les séquences de clics sont
+générées une fois par catalogue et rejouées à l'identique sur chaque moteur ;
+`--replay` rejoue des séquences enregistrées (`--record`) sur le catalogue réel.
+
+Usage :
+
+    python benchmark.py --output bench.json
+    python benchmark.py --sizes 7,20,50,120 --sequences 10 --clicks 10 --output bench.json
+    python benchmark.py --sizes 7 --record clicks.json
+    python benchmark.py --sizes 7 --replay clicks.json --engines table,gac
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cpsat_engine
+from gac import GacPropagator
+from rules import CompiledCatalogue, compile_catalogue, load_catalogue
+from table_engine import ConfigTable
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOGUE_PATH = os.path.join(BASE_DIR, "catalogue.json")
+
+ENGINES = ("table", "gac", "cpsat")
+DEFAULT_SIZES = (7, 20, 50, 120)
+RULES_PER_VARIABLE = 30
+SEARCH_WORKERS = 1
+
+# Une action : ("set", variable, valeur), ("unset", variable, None) ou ("reset", None, None)
+Click = Tuple[str, Optional[str], Optional[str]]
+Propagate = Callable[[Dict[str, int]], Tuple[Dict[str, List[str]], bool]]
+
+
+# -------------------------
+# Catalogues synthétiques
+# -------------------------
+
+def generate_catalogue(n_variables: int, n_rules: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Catalogue aléatoire au format de catalogue.json : domaines de 2 à 6
+    valeurs, règles `forbidden` sur 2 ou 3 variables et quelques règles
+    `requires`. Les règles touchent surtout des variables voisines, comme les
+    options d'un même sous-ensemble du véhicule. Une configuration cachée
+    respecte toutes les règles, le catalogue n'est donc jamais vide.
+    """
+    rng = random.Random(seed)
+    variables = {f"v{i:03d}": [f"o{j}" for j in range(rng.randint(2, 6))] for i in range(n_variables)}
+    names = list(variables)
+    planted = {name: rng.choice(values) for name, values in variables.items()}
+    prices = {name: {value: rng.randrange(0, 5000, 100) for value in values} for name, values in variables.items()}
+
+    def neighbours(k: int) -> List[str]:
+        first = rng.randrange(len(names))
+        scope = {names[first]}
+        while len(scope) < k:
+            scope.add(names[min(len(names) - 1, max(0, first + rng.randint(-8, 8)))])
+        return sorted(scope)
+
+    rules: List[Dict[str, Any]] = []
+    while len(rules) < n_rules:
+        description = f"Règle {len(rules)}"
+        if rng.random() < 0.05:
+            condition, target = neighbours(2)
+            value = rng.choice(variables[condition])
+            allowed = rng.sample(variables[target], max(1, len(variables[target]) - 1))
+            if value == planted[condition] and planted[target] not in allowed:
+                continue
+            rules.append({"description": description, "requires": {"if": {condition: value}, "then": {target: allowed}}})
+        else:
+            combo = {name: rng.choice(variables[name]) for name in neighbours(3 if rng.random() < 0.2 else 2)}
+            if all(planted[name] == value for name, value in combo.items()):
+                continue
+            rules.append({"description": description, "forbidden": [combo]})
+    return {"variables": variables, "prices": prices, "rules": rules}
+
+
+def benchmark_catalogues(sizes: List[int], seed: int) -> List[Tuple[str, CompiledCatalogue]]:
+    catalogues = []
+    for n in sizes:
+        if n == 7:
+            catalogues.append(("catalogue.json", load_catalogue(CATALOGUE_PATH)))
+        else:
+            data = generate_catalogue(n, n * RULES_PER_VARIABLE, seed + n)
+            catalogues.append((f"synthetic-{n}", compile_catalogue(data, f"synthetic-{n}")))
+    return catalogues
+
+
+# -------------------------
+# Séquences de clics
+# -------------------------
+
+def generate_clicks(
+    catalogue: CompiledCatalogue,
+    propagate: Propagate,
+    n_sequences: int,
+    n_clicks: int,
+    seed: int = 0,
+) -> List[List[Click]]:
+    """
+    Séquences de clics réalistes : l'utilisateur choisit une valeur encore
+    proposée (domaine après propagation), revient parfois sur un choix, et
+    recommence de zéro au début de chaque séquence.
+    """
+    rng = random.Random(seed)
+    variables = catalogue.variables
+    sequences = []
+    for _ in range(n_sequences):
+        chosen: Dict[str, int] = {}
+        clicks: List[Click] = [("reset", None, None)]
+        for _ in range(n_clicks):
+            if chosen and rng.random() < 0.15:
+                name = rng.choice(list(chosen))
+                del chosen[name]
+                clicks.append(("unset", name, None))
+                continue
+            domains, valid = propagate(chosen)
+            free = [name for name in variables if name not in chosen and domains[name]]
+            if not valid or not free:
+                break
+            name = rng.choice(free)
+            value = rng.choice(domains[name])
+            chosen[name] = catalogue.index[name][value]
+            clicks.append(("set", name, value))
+        sequences.append(clicks)
+    return sequences
+
+
+def load_clicks(path: str) -> List[List[Click]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [[(c[0], c[1], c[2]) for c in sequence] for sequence in data["sequences"]]
+
+
+def save_clicks(path: str, sequences: List[List[Click]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"sequences": [[list(c) for c in sequence] for sequence in sequences]}, f)
+
+
+# -------------------------
+# Moteurs
+# -------------------------
+
+class _CountingGac:
+    """
+    Propagation GAC qui compte les réponses incomplètes (budget de recherche
+    épuisé : l'API passerait alors à CP-SAT).
+    """
+
+    def __init__(self, catalogue: CompiledCatalogue):
+        self.gac = GacPropagator(catalogue.variables, catalogue.tables)
+        self.incomplete = 0
+
+    def __call__(self, chosen: Dict[str, int]) -> Tuple[Dict[str, List[str]], bool]:
+        domains, valid, complete = self.gac.propagate(chosen)
+        if not complete:
+            self.incomplete += 1
+        return domains, valid
+
+
+def build_engine(engine: str, catalogue: CompiledCatalogue) -> Optional[Propagate]:
+    if engine == "table":
+        table = ConfigTable.from_catalogue(catalogue)
+        return table.propagate if table is not None else None
+    if engine == "gac":
+        return _CountingGac(catalogue)
+    if engine == "cpsat":
+        return lambda chosen: cpsat_engine.propagate(catalogue, chosen, SEARCH_WORKERS)[:2]
+    raise ValueError(f"Moteur inconnu : {engine}")
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+    }
+
+
+def replay(
+    engine: str,
+    catalogue: CompiledCatalogue,
+    sequences: List[List[Click]],
+    max_requests: Optional[int],
+) -> Dict[str, Any]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    propagate = build_engine(engine, catalogue)
+    build_seconds = time.perf_counter() - started
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if propagate is None:
+        return {"skipped": "catalogue trop grand pour la table"}
+
+    latencies: List[float] = []
+    solves_before = cpsat_engine.solve_calls()
+    started = time.perf_counter()
+    for sequence in sequences:
+        chosen: Dict[str, int] = {}
+        for action, name, value in sequence:
+            if action == "reset":
+                chosen = {}
+            elif action == "unset":
+                chosen.pop(name, None)
+            else:
+                chosen[name] = catalogue.index[name][value]
+            t0 = time.perf_counter()
+            propagate(chosen)
+            latencies.append(time.perf_counter() - t0)
+            if max_requests is not None and len(latencies) >= max_requests:
+                break
+        if max_requests is not None and len(latencies) >= max_requests:
+            break
+    elapsed = time.perf_counter() - started
+    solves = cpsat_engine.solve_calls() - solves_before
+
+    result = {
+        "requests": len(latencies),
+        **latency_summary(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "solves_per_request": round(solves / len(latencies), 2) if latencies else 0,
+        "build_seconds": round(build_seconds, 4),
+        "build_memory_bytes": build_peak,
+    }
+    if engine == "gac":
+        result["incomplete"] = propagate.incomplete
+    return result
+
+
+def solve_latency(catalogue: CompiledCatalogue, sequences: List[List[Click]], max_requests: int) -> Dict[str, Any]:
+    """
+    Latence de `solve` (objectif « cheapest ») sur les affectations finales des séquences.
+    """
+    latencies = []
+    statuses: Dict[str, int] = {}
+    for sequence in sequences[:max_requests]:
+        chosen: Dict[str, int] = {}
+        for action, name, value in sequence:
+            if action == "reset":
+                chosen = {}
+            elif action == "unset":
+                chosen.pop(name, None)
+            else:
+                chosen[name] = catalogue.index[name][value]
+        t0 = time.perf_counter()
+        _, status = cpsat_engine.optimize(catalogue, chosen, "cheapest", {}, {}, SEARCH_WORKERS)
+        latencies.append(time.perf_counter() - t0)
+        statuses[status] = statuses.get(status, 0) + 1
+    if not latencies:
+        return {"requests": 0}
+    return {"requests": len(latencies), **latency_summary(latencies), "statuses": statuses}
+
+
+# -------------------------
+# Programme principal
+# -------------------------
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    engines = [e for e in args.engines.split(",") if e]
+    sizes = [int(n) for n in args.sizes.split(",") if n]
+    report: Dict[str, Any] = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "search_workers": SEARCH_WORKERS,
+        "seed": args.seed,
+        "catalogues": [],
+    }
+
+    for name, catalogue in benchmark_catalogues(sizes, args.seed):
+        gac = GacPropagator(catalogue.variables, catalogue.tables)
+        if args.replay and name == "catalogue.json":
+            sequences = load_clicks(args.replay)
+        else:
+            sequences = generate_clicks(
+                catalogue, lambda chosen: gac.propagate(chosen)[:2], args.sequences, args.clicks, args.seed
+            )
+            if args.record and name == "catalogue.json":
+                save_clicks(args.record, sequences)
+
+        size = 1
+        for values in catalogue.variables.values():
+            size *= len(values)
+        entry: Dict[str, Any] = {
+            "catalogue": name,
+            "rules_hash": catalogue.rules_hash,
+            "variables": len(catalogue.variables),
+            "values": sum(len(values) for values in catalogue.variables.values()),
+            "rules": len(catalogue.rules),
+            "forbidden_tuples": catalogue.tuple_count,
+            "scopes": len(catalogue.tables),
+            "search_space": float(size),
+            "engines": {},
+        }
+        print(f"{name} : {entry['variables']} variables, {entry['rules']} règles", file=sys.stderr)
+        for engine in engines:
+            max_requests = args.cpsat_requests if engine == "cpsat" else args.max_requests
+            entry["engines"][engine] = replay(engine, catalogue, sequences, max_requests)
+            print(f"  {engine:6s} {entry['engines'][engine]}", file=sys.stderr)
+        if "cpsat" in engines:
+            entry["solve"] = solve_latency(catalogue, sequences, args.cpsat_requests)
+        report["catalogues"].append(entry)
+
+    # ru_maxrss : kilo-octets sous Linux
+    report["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc d'essai de latence du configurateur")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES), help="nombres de variables (7 = catalogue réel)")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--sequences", type=int, default=10, help="séquences de clics par catalogue")
+    parser.add_argument("--clicks", type=int, default=10, help="clics par séquence")
+    parser.add_argument("--max-requests", type=int, default=200, help="requêtes max par moteur et par catalogue")
+    parser.add_argument("--cpsat-requests", type=int, default=20, help="requêtes CP-SAT max par catalogue")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="séquences enregistrées (JSON) à rejouer sur le catalogue réel")
+    parser.add_argument("--record", help="enregistre les séquences générées pour le catalogue réel")
+    parser.add_argument("--output", help="fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Registre de catalogues : plusieurs marques ou millésimes dans un même processus.
+
+Chaque catalogue est un fichier `<id>.json` du répertoire des catalogues
+(même format que catalogue.json). Le registre :
+
+- charge et compile un catalogue à sa première utilisation, puis le garde
+  tant que le fichier ne change pas (date de modification) ;
+- partage le moteur de propagation (table compilée, propagateur GAC, cache)
+  entre toutes les versions dont les contraintes sont identiques, repérées
+  par l'empreinte `tables_hash` : deux millésimes qui ne diffèrent que par
+  les prix ou les libellés n'ont qu'une table en mémoire ;
+- décharge les catalogues les moins récemment utilisés quand la mémoire
+  estimée des moteurs dépasse le budget ;
+- reprend tels quels les catalogues déjà compilés par ailleurs (`preload`,
+  utilisé pour "default" avec le catalogue, la table et le GAC de solver.py).
+
+Sans table, la propagation passe par `propagate_without_table` (pré-filtre
+d'implications, GAC, puis CP-SAT), partagée avec le catalogue principal de
+solver.py ; l'API l'exécute alors dans le pool de processus (voir
+`needs_solver`).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import cpsat_engine
+import metrics
+from cache import ResultCache
+from gac import GacPropagator
+from implications import ImplicationMatrix
+from rules import CompiledCatalogue, compile_catalogue
+from table_engine import ConfigTable
+
+
+CATALOGUE_MEMORY_BUDGET = int(os.environ.get("CONFIGURATOR_CATALOGUE_MEMORY_MB", "512")) * 1024 * 1024
+ENGINE_CACHE_MAX_ENTRIES = 1024
+ENGINE_CACHE_TTL_SECONDS = 600.0
+# Mémoire comptée par combinaison interdite quand il n'y a pas de table
+_BYTES_PER_TUPLE = 200
+
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+
+def propagate_without_table(
+    catalogue: CompiledCatalogue,
+    gac: GacPropagator,
+    implications: ImplicationMatrix,
+    chosen: Dict[str, int],
+    search_workers: int,
+) -> Tuple[Dict[str, List[str]], bool, bool]:
+    """
+    (domaines, cohérent, complet) sans table : les valeurs exclues par les
+    choix pris un à un (matrice d'implications) sont écartées d'emblée, puis
+    GAC propage ; CP-SAT ne tranche que si la recherche GAC a épuisé son budget,
+    et seulement parmi les valeurs que GAC a laissées.
+    """
+    candidates = implications.candidates(chosen)
+    if candidates is None:
+        return {name: [] for name in catalogue.variables}, False, True
+    with metrics.span("propagate_gac"):
+        domains, is_consistent, complete = gac.propagate(chosen, candidates)
+    if complete:
+        return domains, is_consistent, True
+    # Domaines GAC (sur-ensembles exacts, inclus dans `candidates`) en masques
+    index = catalogue.index
+    remaining = [sum(1 << index[name][value] for value in domains[name]) for name in catalogue.variables]
+    with metrics.span("propagate_cpsat"):
+        return cpsat_engine.propagate(catalogue, chosen, search_workers, candidates=remaining)
+
+
+class CatalogueEngine:
+    """
+    Propagation pour un jeu de contraintes (variables + tables interdites),
+    partagée par tous les catalogues de même `tables_hash`.
+    """
+
+    def __init__(
+        self,
+        catalogue: CompiledCatalogue,
+        search_workers: int,
+        table: Optional[ConfigTable] = None,
+        gac: Optional[GacPropagator] = None,
+        implications: Optional[ImplicationMatrix] = None,
+    ):
+        """
+        `table`, `gac` et `implications` : structures déjà construites pour ce
+        catalogue, à réutiliser (sinon construites ici ; la matrice
+        d'implications seulement sans table, par arc-consistance).
+        """
+        self.tables_hash = catalogue.tables_hash
+        self.catalogue = catalogue
+        self.search_workers = search_workers
+        self.table = table if table is not None else ConfigTable.from_catalogue(catalogue)
+        self.gac = gac if gac is not None else GacPropagator(catalogue.variables, catalogue.tables)
+        if implications is None and self.table is None:
+            implications = ImplicationMatrix(catalogue.variables, self.gac.arc_consistency)
+        self.implications = implications
+        self.cache = ResultCache(ENGINE_CACHE_MAX_ENTRIES, ENGINE_CACHE_TTL_SECONDS, self.tables_hash)
+        self.memory_bytes = self._estimate_memory()
+
+    def _estimate_memory(self) -> int:
+        size = _BYTES_PER_TUPLE * self.catalogue.tuple_count
+        if self.table is not None:
+            size += sys.getsizeof(self.table.valid) + sys.getsizeof(self.table.full)
+            size += sum(sys.getsizeof(mask) for masks in self.table.value_masks for mask in masks)
+        return size
+
+    def _propagate(self, chosen: Tuple[Tuple[str, int], ...]) -> Tuple[Dict[str, List[str]], bool, bool]:
+        if self.table is not None:
+            with metrics.span("propagate_table"):
+                return (*self.table.propagate(dict(chosen)), True)
+        return propagate_without_table(self.catalogue, self.gac, self.implications, dict(chosen), self.search_workers)
+
+    def propagate(self, chosen: Dict[str, int]) -> Tuple[Dict[str, List[str]], bool]:
+        key = tuple(sorted(chosen.items()))
+        # Seuls les résultats complets vont en cache (voir cpsat_engine.propagate)
+        domains, is_consistent, _ = self.cache.get_or_compute(key, lambda: self._propagate(key), lambda result: result[2])
+        return {name: list(values) for name, values in domains.items()}, is_consistent
+
+    def propagate_with_counts(self, chosen: Dict[str, int]) -> Tuple[Dict[str, List[str]], bool, Optional[Dict[str, Dict[str, int]]]]:
+        if self.table is None:
+            domains, is_consistent = self.propagate(chosen)
+            return domains, is_consistent, None
+        with metrics.span("support_counts"):
+            counts = self.table.support_counts(chosen)
+        domains = {name: list(value_counts) for name, value_counts in counts.items()}
+        return domains, any(domains.values()), counts
+
+
+class LoadedCatalogue:
+    def __init__(self, catalogue_id: str, path: str, mtime: float, catalogue: CompiledCatalogue, engine: CatalogueEngine):
+        self.id = catalogue_id
+        self.path = path
+        self.mtime = mtime
+        self.catalogue = catalogue
+        self.engine = engine
+
+    def chosen_indices(self, assignments: Dict[str, Optional[str]]) -> Dict[str, int]:
+        """
+        Choix exploitables (variable et valeur connues de ce catalogue), en indices.
+        """
+        index = self.catalogue.index
+        return {
+            name: index[name][value]
+            for name, value in assignments.items()
+            if name in index and value in index[name]
+        }
+
+    def needs_solver(self) -> bool:
+        """
+        Vrai si la propagation peut lancer une recherche (pas de table).
+        """
+        return self.engine.table is None
+
+    def propagate(self, assignments: Dict[str, Optional[str]], with_counts: bool = False) -> Dict[str, Any]:
+        chosen = self.chosen_indices(assignments)
+        if with_counts:
+            domains, is_consistent, counts = self.engine.propagate_with_counts(chosen)
+            return {"domains": domains, "valid": is_consistent, "counts": counts}
+        domains, is_consistent = self.engine.propagate(chosen)
+        return {"domains": domains, "valid": is_consistent}
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "version": self.catalogue.rules_hash,
+            "variables": self.catalogue.variables,
+            "labels": self.catalogue.labels,
+        }
+
+
+class CatalogueRegistry:
+    def __init__(
+        self,
+        directory: str,
+        memory_budget: int = CATALOGUE_MEMORY_BUDGET,
+        extra: Optional[Dict[str, str]] = None,
+        search_workers: int = 1,
+    ):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        # Catalogues hors répertoire (ex. "default" -> catalogue.json)
+        self.extra = dict(extra or {})
+        self.search_workers = search_workers
+        self._loaded: "OrderedDict[str, LoadedCatalogue]" = OrderedDict()
+        # Moteurs partagés : tables_hash -> (moteur, nombre de catalogues qui l'utilisent)
+        self._engines: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.shared = 0
+
+    def _path(self, catalogue_id: str) -> str:
+        if catalogue_id in self.extra:
+            return self.extra[catalogue_id]
+        if not _ID_PATTERN.match(catalogue_id):
+            raise KeyError(catalogue_id)
+        return os.path.join(self.directory, f"{catalogue_id}.json")
+
+    def ids(self) -> List[str]:
+        ids = set(self.extra)
+        if os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                name, ext = os.path.splitext(filename)
+                if ext == ".json" and _ID_PATTERN.match(name):
+                    ids.add(name)
+        return sorted(ids)
+
+    def preload(
+        self,
+        catalogue_id: str,
+        path: str,
+        catalogue: CompiledCatalogue,
+        table: Optional[ConfigTable],
+        gac: GacPropagator,
+        implications: Optional[ImplicationMatrix] = None,
+    ) -> None:
+        """
+        Enregistre un catalogue déjà compilé (et sa table, son GAC, sa
+        matrice d'implications) au lieu
+        de le recompiler à la première demande. Il est recompilé comme les
+        autres si son fichier change.
+        """
+        engine = CatalogueEngine(catalogue, self.search_workers, table, gac, implications)
+        with self._lock:
+            if catalogue_id in self._loaded:
+                self._unload(catalogue_id)
+            entry = self._engines.setdefault(catalogue.tables_hash, [engine, 0])
+            entry[1] += 1
+            self._loaded[catalogue_id] = LoadedCatalogue(catalogue_id, path, os.stat(path).st_mtime, catalogue, entry[0])
+
+    def get(self, catalogue_id: str) -> LoadedCatalogue:
+        """
+        Catalogue chargé (compilé à la première demande ou si le fichier a
+        changé). Lève KeyError si le catalogue n'existe pas, ValueError s'il
+        est invalide.
+        """
+        path = self._path(catalogue_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            raise KeyError(catalogue_id)
+        with self._lock:
+            loaded = self._loaded.get(catalogue_id)
+            if loaded is not None and loaded.mtime == mtime:
+                self._loaded.move_to_end(catalogue_id)
+                return loaded
+
+        # Compilation hors verrou : les autres catalogues restent servis
+        with open(path, "rb") as f:
+            raw = f.read()
+        with metrics.span("catalogue_compile"):
+            catalogue = compile_catalogue(json.loads(raw.decode("utf-8")), hashlib.sha256(raw).hexdigest())
+        with self._lock:
+            entry = self._engines.get(catalogue.tables_hash)
+        # Moteur construit hors verrou lui aussi, sauf s'il est déjà partagé
+        engine = entry[0] if entry is not None else CatalogueEngine(catalogue, self.search_workers)
+
+        with self._lock:
+            loaded = self._loaded.get(catalogue_id)
+            if loaded is not None and loaded.mtime == mtime:
+                # Chargé entre-temps par une autre requête
+                self._loaded.move_to_end(catalogue_id)
+                return loaded
+            if loaded is not None:
+                self._unload(catalogue_id)
+            entry = self._engines.get(catalogue.tables_hash)
+            if entry is None:
+                entry = self._engines[catalogue.tables_hash] = [engine, 0]
+            else:
+                self.shared += 1
+            entry[1] += 1
+            loaded = LoadedCatalogue(catalogue_id, path, mtime, catalogue, entry[0])
+            self._loaded[catalogue_id] = loaded
+            self.loads += 1
+            self._evict(keep=catalogue_id)
+        return loaded
+
+    def _unload(self, catalogue_id: str) -> None:
+        loaded = self._loaded.pop(catalogue_id)
+        entry = self._engines[loaded.engine.tables_hash]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._engines[loaded.engine.tables_hash]
+
+    def _memory(self) -> int:
+        return sum(engine.memory_bytes for engine, _ in self._engines.values())
+
+    def _evict(self, keep: str) -> None:
+        while self._memory() > self.memory_budget:
+            oldest = next((cid for cid in self._loaded if cid != keep), None)
+            if oldest is None:
+                break
+            self._unload(oldest)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": list(self._loaded),
+                "engines": len(self._engines),
+                "memory_bytes": self._memory(),
+                "memory_budget": self.memory_budget,
+                "loads": self.loads,
+                "shared": self.shared,
+                "evictions": self.evictions,
+            }
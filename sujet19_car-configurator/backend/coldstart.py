@@ -0,0 +1,127 @@
+"""
+Banc d'essai du démarrage à froid de l'API.
+
+Chaque mesure lance un interpréteur neuf (comme un nouveau conteneur ou une
+exécution de tests) qui importe `main`, exécute le cycle de vie de
+l'application (démarrage du pool de solveurs, comme uvicorn), puis répond à
+une première propagation et à une première résolution CP-SAT. On mesure :
+
+- `process_ms` : durée totale du processus, interpréteur compris ;
+- `import_main_ms` : import de l'application (FastAPI, catalogue, table...) ;
+- `lifespan_ms` : démarrage de l'application (processus du pool prêts) ;
+- `startup_ms` : import et démarrage, avant la première requête ;
+- `first_propagate_ms` : première propagation (sans OR-Tools avec la table) ;
+- `first_solve_ms` : première résolution « cheapest », qui paie l'import
+  différé d'OR-Tools (dans un processus du pool) ;
+- `ortools_loaded_after_import` : OR-Tools déjà chargé après l'import de
+  main (devrait rester faux).
+
+Deux scénarios : `cold` (cache des structures compilées supprimé avant
+chaque lancement) et `warm` (cache présent). Le pool a sa taille par défaut
+(`CONFIGURATOR_POOL_WORKERS` pour en changer). `--budget-ms` fait échouer le
+banc (code 1) si le p50 de `startup_ms` à chaud dépasse ce budget.
+
+Usage :
+
+    python coldstart.py --runs 5 --output coldstart.json
+    python coldstart.py --catalogue autre.json --budget-ms 800
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmark import latency_summary
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Programme exécuté dans chaque interpréteur neuf ; écrit ses mesures en JSON
+_CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+ortools_loaded = "ortools" in sys.modules
+
+async def requests():
+    async with main.lifespan(main.app):
+        ready = time.perf_counter()
+        name = next(iter(main.VARIABLES))
+        await main._propagation({name: main.VARIABLES[name][0]}, False)
+        propagated = time.perf_counter()
+        await main._dispatch("solve", {}, "cheapest", None, None)
+        solved = time.perf_counter()
+    return ready, propagated, solved
+
+ready, propagated, solved = asyncio.run(requests())
+print(json.dumps({
+    "import_main_ms": (imported - started) * 1000,
+    "lifespan_ms": (ready - imported) * 1000,
+    "startup_ms": (ready - started) * 1000,
+    "first_propagate_ms": (propagated - ready) * 1000,
+    "first_solve_ms": (solved - propagated) * 1000,
+    "ortools_loaded_after_import": ortools_loaded,
+}))
+"""
+
+PHASES = ("process_ms", "import_main_ms", "lifespan_ms", "startup_ms", "first_propagate_ms", "first_solve_ms")
+
+
+def run_once(env: Dict[str, str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", _CHILD], cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    return {"process_ms": elapsed, **json.loads(out.stdout.strip().splitlines()[-1])}
+
+
+def scenario(env: Dict[str, str], cache_path: str, cold: bool, runs: int) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        if cold and os.path.exists(cache_path):
+            os.remove(cache_path)
+        samples.append(run_once(env))
+    report: Dict[str, Any] = {phase: latency_summary([s[phase] / 1000 for s in samples]) for phase in PHASES}
+    report["ortools_loaded_after_import"] = any(s["ortools_loaded_after_import"] for s in samples)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc d'essai du démarrage à froid")
+    parser.add_argument("--runs", type=int, default=5, help="lancements par scénario")
+    parser.add_argument("--catalogue", help="fichier catalogue (défaut : celui de solver.py)")
+    parser.add_argument("--budget-ms", type=float, help="p50 maximal de startup_ms à chaud")
+    parser.add_argument("--output", help="fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "compiled.cache")
+        env = {**os.environ, "CONFIGURATOR_COMPILED_CACHE": cache_path}
+        if args.catalogue:
+            env["CONFIGURATOR_CATALOGUE"] = os.path.abspath(args.catalogue)
+        report = {
+            "runs": args.runs,
+            "cold": scenario(env, cache_path, cold=True, runs=args.runs),
+            "warm": scenario(env, cache_path, cold=False, runs=args.runs),
+        }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    warm_startup = report["warm"]["startup_ms"]["p50_ms"]
+    if args.budget_ms is not None and warm_startup > args.budget_ms:
+        print(f"Démarrage trop lent : {warm_startup:.0f} ms avant la première requête (budget {args.budget_ms:.0f} ms)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
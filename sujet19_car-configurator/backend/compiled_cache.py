@@ -0,0 +1,80 @@
+"""
+Cache disque des structures compilées au démarrage (catalogue compilé, table
+des configurations valides, matrice d'implications).
+
+Au premier démarrage, solver.py compile le catalogue puis écrit ce fichier ;
+les démarrages suivants le relisent au lieu de recompiler. Le fichier est
+ignoré (et réécrit) si le catalogue a changé, si `MAX_TABLE_SIZE` a changé
+ou si son format n'est plus celui du code :
+
+    en-tête : magic, format, empreinte du fichier catalogue (sha256)
+    corps   : pickle des objets compilés
+
+Le fichier est lu avec pickle : il doit être aussi fiable que le code
+lui-même (même répertoire, mêmes droits). `CONFIGURATOR_COMPILED_CACHE=""`
+désactive le cache ; un répertoire en lecture seule le désactive aussi en
+écriture, sans erreur.
+"""
+
+import hashlib
+import os
+import pickle
+import struct
+from typing import Any, Dict, Optional
+
+from table_engine import MAX_TABLE_SIZE
+
+
+MAGIC = b"CFGCMP01"
+# À incrémenter dès que la structure d'un objet sérialisé change
+# (CompiledCatalogue, ConfigTable, masques d'implications)
+FORMAT_VERSION = 1
+# magic, format, MAX_TABLE_SIZE, empreinte du catalogue (sha256)
+HEADER = struct.Struct("<8sIQ32s")
+
+
+def catalogue_hash(catalogue_path: str) -> str:
+    with open(catalogue_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load(path: str, source_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Objets compilés pour le catalogue d'empreinte `source_hash`, ou None si
+    le fichier est absent, illisible ou périmé.
+    """
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                return None
+            magic, version, max_table_size, digest = HEADER.unpack(header)
+            if (magic, version, max_table_size, digest) != (MAGIC, FORMAT_VERSION, MAX_TABLE_SIZE, bytes.fromhex(source_hash)):
+                return None
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def save(path: str, source_hash: str, entries: Dict[str, Any]) -> bool:
+    """
+    Écrit le cache (fichier temporaire puis renommage : un lecteur ne voit
+    jamais un fichier à moitié écrit). Renvoie False si l'écriture échoue.
+    """
+    if not path:
+        return False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, MAX_TABLE_SIZE, bytes.fromhex(source_hash)))
+            pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
@@ -0,0 +1,251 @@
+"""
+Modèle CP-SAT d'un catalogue compilé et propagation par CP-SAT.
+
+Les fonctions prennent le catalogue en paramètre, ce qui permet de les
+utiliser pour d'autres catalogues que celui chargé par solver.py (bancs
+d'essai, catalogues synthétiques).
+
+OR-Tools n'est importé qu'au premier modèle construit (environ 0,5 s avec
+ses dépendances) : un démarrage qui n'a besoin que de la table ne le paie pas.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import metrics
+from rules import CompiledCatalogue
+
+if TYPE_CHECKING:
+    from ortools.sat.python import cp_model
+
+
+# Nombre total d'appels à CpSolver.Solve passés par solve() (pour les mesures)
+_solve_calls = 0
+_solve_calls_lock = threading.Lock()
+
+
+def solve_calls() -> int:
+    return _solve_calls
+
+
+_cp_model: Any = None
+
+
+def load_ortools() -> Any:
+    """
+    Module cp_model d'OR-Tools, importé à la première demande.
+    """
+    global _cp_model
+    if _cp_model is None:
+        with metrics.span("import_ortools"):
+            from ortools.sat.python import cp_model
+        _cp_model = cp_model
+    return _cp_model
+
+
+def solve(solver: "cp_model.CpSolver", model: "cp_model.CpModel", callback: Optional["cp_model.CpSolverSolutionCallback"] = None) -> int:
+    """
+    Point de passage unique des appels à CpSolver.Solve (comptés et mesurés).
+    """
+    global _solve_calls
+    with _solve_calls_lock:
+        _solve_calls += 1
+    if callback is None:
+        status = solver.Solve(model)
+    else:
+        status = solver.Solve(model, callback)
+    metrics.record_solve(solver, status)
+    return status
+
+
+def build_model(catalogue: CompiledCatalogue, chosen: Dict[str, int]) -> Tuple["cp_model.CpModel", Dict[str, "cp_model.IntVar"]]:
+    cp_model = load_ortools()
+    with metrics.span("build_model"):
+        model = cp_model.CpModel()
+        vars_int = {}
+
+        # Création des variables CP-SAT (un IntVar par dimension)
+        for var_name, domain in catalogue.variables.items():
+            vars_int[var_name] = model.NewIntVar(0, len(domain) - 1, var_name)
+
+        # Affectations partielles
+        for var_name, idx in chosen.items():
+            model.Add(vars_int[var_name] == idx)
+
+        # -------------------------
+        # Contraintes métier : une table interdite par portée, issue du catalogue compilé
+        # -------------------------
+        for scope, tuples in catalogue.tables:
+            model.AddForbiddenAssignments([vars_int[name] for name in scope], tuples)
+
+    return model, vars_int
+
+
+_domain_collector_class: Any = None
+
+
+def domain_collector(variables: Dict[str, "cp_model.IntVar"]) -> Any:
+    """
+    Callback qui relève, pour chaque variable, les valeurs vues dans les
+    solutions (classe définie au premier appel, une fois OR-Tools importé).
+    """
+    global _domain_collector_class
+    if _domain_collector_class is None:
+        cp_model = load_ortools()
+
+        class DomainCollector(cp_model.CpSolverSolutionCallback):
+            def __init__(self, variables: Dict[str, "cp_model.IntVar"]):
+                super().__init__()
+                self._vars = variables
+                self.domains: Dict[str, Set[int]] = {name: set() for name in variables}
+
+            def on_solution_callback(self):
+                for name, var in self._vars.items():
+                    self.domains[name].add(self.Value(var))
+
+        _domain_collector_class = DomainCollector
+    return _domain_collector_class(variables)
+
+
+def propagate(
+    catalogue: CompiledCatalogue,
+    chosen: Dict[str, int],
+    search_workers: int,
+    time_limit: float = 0.5,
+    candidates: Optional[List[int]] = None,
+) -> Tuple[Dict[str, List[str]], bool, bool]:
+    """
+    Renvoie (domaines, cohérent, complet), comme GacPropagator.propagate.
+
+    Un seul modèle est construit : chaque valeur (var, idx) reçoit un littéral
+    qui force var == idx, testé par hypothèse (AddAssumptions). Chaque solution
+    trouvée sert de témoin pour toutes les valeurs qu'elle contient, qui ne
+    sont donc plus jamais retestées : le nombre de résolutions est borné par
+    le nombre de témoins distincts plus le nombre de valeurs impossibles.
+
+    `candidates` (masque des valeurs par variable, dans l'ordre du catalogue)
+    écarte sans résolution les valeurs déjà connues comme impossibles.
+
+    Une résolution arrêtée par `time_limit` (UNKNOWN) ne prouve rien : la
+    valeur testée reste dans son domaine et `complet` est faux (domaines
+    sur-ensembles des valeurs possibles). Si c'est la première résolution,
+    les domaines sont les valeurs candidates et l'affectation n'est pas
+    déclarée incohérente.
+    """
+    variables = catalogue.variables
+    cp_model = load_ortools()
+    model, vars_int = build_model(catalogue, chosen)
+
+    literals: Dict[Tuple[str, int], "cp_model.IntVar"] = {}
+    for var_name, values in variables.items():
+        for idx in range(len(values)):
+            lit = model.NewBoolVar(f"{var_name}=={values[idx]}")
+            model.Add(vars_int[var_name] == idx).OnlyEnforceIf(lit)
+            literals[(var_name, idx)] = lit
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = search_workers
+    collector = domain_collector(vars_int)
+
+    position = {name: k for k, name in enumerate(variables)}
+
+    def candidate(var_name: str, idx: int) -> bool:
+        return candidates is None or bool(candidates[position[var_name]] >> idx & 1)
+
+    # Première résolution sans hypothèse : si elle échoue, rien n'est possible
+    status = solve(solver, model, collector)
+    if status == cp_model.UNKNOWN:
+        domains = {
+            name: [value for idx, value in enumerate(values) if chosen.get(name, idx) == idx and candidate(name, idx)]
+            for name, values in variables.items()
+        }
+        return domains, True, False
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return {name: [] for name in variables}, False, True
+
+    # Valeurs dont la résolution n'a pas conclu : gardées, sans preuve
+    unproven: Set[Tuple[str, int]] = set()
+    for (var_name, idx), lit in literals.items():
+        if idx in collector.domains[var_name]:
+            continue
+        if not candidate(var_name, idx):
+            continue
+        model.ClearAssumptions()
+        model.AddAssumptions([lit])
+        if solve(solver, model, collector) == cp_model.UNKNOWN:
+            unproven.add((var_name, idx))
+
+    domains: Dict[str, List[str]] = {
+        name: [
+            value for idx, value in enumerate(values)
+            if idx in collector.domains[name] or (name, idx) in unproven
+        ]
+        for name, values in variables.items()
+    }
+    return domains, True, not unproven
+
+
+def optimize(
+    catalogue: CompiledCatalogue,
+    chosen: Dict[str, int],
+    objective: str,
+    reference: Dict[str, int],
+    hint: Dict[str, int],
+    search_workers: int,
+    time_limit: float = 1.0,
+    weights: Optional[Dict[str, int]] = None,
+) -> Tuple[Optional[Dict[str, str]], str]:
+    """
+    Configuration complète compatible avec `chosen`, optimisée selon
+    `objective` ("any", "cheapest", "premium" ou "closest" de `reference`,
+    avec les poids du catalogue ou `weights`).
+    Renvoie (configuration ou None, statut).
+    """
+    variables = catalogue.variables
+    cp_model = load_ortools()
+    model, vars_int = build_model(catalogue, chosen)
+
+    if objective in ("cheapest", "premium"):
+        price_terms = []
+        for name, values in variables.items():
+            prices = [catalogue.prices[name][value] for value in values]
+            price = model.NewIntVar(min(prices), max(prices), f"price_{name}")
+            model.AddElement(vars_int[name], prices, price)
+            price_terms.append(price)
+        if objective == "cheapest":
+            model.Minimize(sum(price_terms))
+        else:
+            model.Maximize(sum(price_terms))
+    elif objective == "closest":
+        weights = weights or catalogue.weights
+        changes = []
+        for name, idx in reference.items():
+            changed = model.NewBoolVar(f"changed_{name}")
+            model.Add(vars_int[name] != idx).OnlyEnforceIf(changed)
+            model.Add(vars_int[name] == idx).OnlyEnforceIf(changed.Not())
+            changes.append(weights[name] * changed)
+        model.Minimize(sum(changes))
+
+    # Démarrage à chaud depuis la dernière solution connue
+    for name, idx in hint.items():
+        model.AddHint(vars_int[name], idx)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = search_workers
+
+    status = solve(solver, model)
+
+    if status == cp_model.UNKNOWN:
+        # Limite de temps atteinte sans solution : rien n'est prouvé
+        return None, "UNKNOWN"
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, "INFEASIBLE"
+
+    # Récupération d'une solution
+    result = {name: variables[name][solver.Value(var)] for name, var in vars_int.items()}
+
+    if objective != "any" and status == cp_model.OPTIMAL:
+        return result, "OPTIMAL"
+    return result, "FEASIBLE"
@@ -0,0 +1,183 @@
+"""
+Explication des affectations incohérentes.
+
+Pour des choix sans configuration possible, on calcule avec QuickXplain
+(Junker, 2004) :
+
+1. un sous-ensemble minimal des choix de l'utilisateur qui est déjà
+   incohérent (retirer n'importe lequel de ces choix lève le conflit) ;
+2. un sous-ensemble minimal des règles du catalogue qui, avec ces choix,
+   rend le problème infaisable.
+
+Le test de cohérence utilise la table compilée quand elle existe (un ET
+binaire par test, les règles étant précompilées en masques de violation),
+sinon CP-SAT. Les conflits trouvés sont gardés en cache : une nouvelle
+affectation qui contient un conflit connu (typiquement une paire ou un
+triplet de choix) est expliquée sans recalcul.
+
+Un test CP-SAT arrêté par sa limite de temps (statut UNKNOWN) n'est pas
+compté comme une preuve d'incohérence : l'explication renvoyée est alors
+marquée non minimale (`"minimal": False`), n'est pas mise en cache, et se
+replie sur tous les choix (ou toutes les règles) si le sous-ensemble trouvé
+n'a pas pu être prouvé incohérent.
+"""
+
+import threading
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple, TypeVar
+
+import cpsat_engine
+from rules import CompiledCatalogue
+from table_engine import ConfigTable
+
+
+T = TypeVar("T")
+
+CONFLICT_CACHE_MAX_ENTRIES = 1024
+# Limite de temps d'un test de cohérence CP-SAT
+CHECK_TIME_LIMIT_SECONDS = 1.0
+
+
+def quickxplain(items: Sequence[T], consistent: Callable[[List[T]], bool]) -> Optional[List[T]]:
+    """
+    Sous-ensemble minimal (au sens de l'inclusion) de `items` incohérent,
+    ou None si `items` est cohérent dans son ensemble.
+    """
+    items = list(items)
+    if consistent(items):
+        return None
+
+    def qx(background: List[T], delta: List[T], candidates: List[T]) -> List[T]:
+        if delta and not consistent(background):
+            return []
+        if len(candidates) == 1:
+            return candidates
+        half = len(candidates) // 2
+        first, second = candidates[:half], candidates[half:]
+        in_second = qx(background + first, first, second)
+        in_first = qx(background + in_second, in_second, first)
+        return in_first + in_second
+
+    if not items or not consistent([]):
+        return []
+    return qx([], [], items)
+
+
+class ConflictExplainer:
+    def __init__(self, catalogue: CompiledCatalogue, table: Optional[ConfigTable], search_workers: int = 1):
+        self.catalogue = catalogue
+        self.table = table
+        self.search_workers = search_workers
+        self.position = {name: k for k, name in enumerate(catalogue.variables)}
+        # Masque des configurations violant chaque règle (si la table existe)
+        self._violations: List[int] = []
+        if table is not None:
+            for _, rule_tuples in catalogue.rules:
+                mask = 0
+                for scope, values in rule_tuples:
+                    mask |= table.tuples_mask([self.position[n] for n in scope], [values])
+                self._violations.append(mask)
+        self._conflicts: Dict[FrozenSet[Tuple[str, int]], List[int]] = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # -------------------------
+    # Test de cohérence
+    # -------------------------
+
+    def _feasible(self, choices: Sequence[Tuple[str, int]], rules: Sequence[int], search_workers: int) -> Optional[bool]:
+        """
+        Vrai ou faux, ou None si CP-SAT n'a pas conclu dans le temps imparti.
+        """
+        chosen = dict(choices)
+        if len(chosen) < len(choices):
+            # Deux valeurs pour une même variable
+            return False
+        if self.table is not None:
+            violated = 0
+            for r in rules:
+                violated |= self._violations[r]
+            return self.table.restrict(chosen, self.table.full & ~violated) != 0
+
+        cp_model = cpsat_engine.load_ortools()
+        model = cp_model.CpModel()
+        vars_int = {
+            name: model.NewIntVar(0, len(values) - 1, name) for name, values in self.catalogue.variables.items()
+        }
+        for name, idx in chosen.items():
+            model.Add(vars_int[name] == idx)
+        for r in rules:
+            for scope, values in self.catalogue.rules[r][1]:
+                model.AddForbiddenAssignments([vars_int[n] for n in scope], [values])
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = CHECK_TIME_LIMIT_SECONDS
+        solver.parameters.num_search_workers = search_workers
+        status = cpsat_engine.solve(solver, model)
+        if status == cp_model.UNKNOWN:
+            return None
+        return status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    # -------------------------
+    # Explication
+    # -------------------------
+
+    def _known_conflict(self, choices: FrozenSet[Tuple[str, int]]) -> Optional[Tuple[FrozenSet[Tuple[str, int]], List[int]]]:
+        with self._lock:
+            for conflict, rules in self._conflicts.items():
+                if conflict <= choices:
+                    return conflict, rules
+        return None
+
+    def explain(self, chosen: Dict[str, int], search_workers: Optional[int] = None) -> Optional[Dict]:
+        """
+        None si les choix sont cohérents, sinon le conflit et les règles en
+        cause : {"conflict": {var: valeur}, "rules": [descriptions],
+        "minimal": bool}. `search_workers` remplace le nombre de threads
+        CP-SAT du constructeur.
+        """
+        workers = search_workers or self.search_workers
+        choices = sorted(chosen.items(), key=lambda item: self.position[item[0]])
+        all_rules = list(range(len(self.catalogue.rules)))
+        unknown: List[bool] = []
+
+        def consistent(subset: Sequence[Tuple[str, int]], rules: Sequence[int]) -> bool:
+            feasible = self._feasible(subset, rules, workers)
+            if feasible is None:
+                # Sans preuve d'incohérence, le sous-ensemble reste candidat
+                unknown.append(True)
+                return True
+            return feasible
+
+        known = self._known_conflict(frozenset(choices))
+        if known is not None:
+            with self._lock:
+                self.cache_hits += 1
+            conflict_set, rules = known
+            conflict = sorted(conflict_set, key=lambda item: self.position[item[0]])
+        else:
+            conflict = quickxplain(choices, lambda subset: consistent(subset, all_rules))
+            if conflict is None and not unknown:
+                return None
+            with self._lock:
+                self.cache_misses += 1
+            if unknown and (conflict is None or self._feasible(conflict, all_rules, workers) is not False):
+                conflict = choices
+            rules = quickxplain(all_rules, lambda subset: consistent(conflict, subset)) or []
+            if unknown and self._feasible(conflict, rules, workers) is not False:
+                rules = all_rules
+            if not unknown:
+                with self._lock:
+                    if len(self._conflicts) >= CONFLICT_CACHE_MAX_ENTRIES:
+                        self._conflicts.pop(next(iter(self._conflicts)))
+                    self._conflicts[frozenset(conflict)] = rules
+
+        variables = self.catalogue.variables
+        return {
+            "conflict": {name: variables[name][idx] for name, idx in conflict},
+            "rules": [self.catalogue.rules[r][0] for r in rules],
+            "minimal": not unknown,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"known_conflicts": len(self._conflicts), "hits": self.cache_hits, "misses": self.cache_misses}
@@ -0,0 +1,176 @@
+"""
+Propagation par arc-consistance généralisée (GAC), en Python pur.
+
+Alternative à CP-SAT pour les catalogues trop grands pour la table
+compilée. Les domaines sont des masques de bits (bit v = valeur v) et les
+contraintes sont les tables interdites du catalogue compilé.
+
+La GAC seule ne garantit pas qu'une valeur restante appartienne à une
+configuration complète. On certifie donc chaque valeur par une petite
+recherche avec maintien de la GAC (MAC) : une solution trouvée sert de
+témoin pour toutes ses valeurs. Si la recherche dépasse son budget de
+noeuds, la propagation est déclarée incomplète et l'appelant doit se
+rabattre sur CP-SAT.
+"""
+
+from itertools import product
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from rules import ForbiddenTable
+
+
+# Budget de noeuds de recherche pour certifier toutes les valeurs d'une requête
+GAC_NODE_LIMIT = 20_000
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+def _values(mask: int) -> List[int]:
+    out = []
+    v = 0
+    while mask:
+        if mask & 1:
+            out.append(v)
+        mask >>= 1
+        v += 1
+    return out
+
+
+class GacPropagator:
+    def __init__(self, variables: Dict[str, List[str]], tables: Sequence[ForbiddenTable], node_limit: int = GAC_NODE_LIMIT):
+        self.variables = variables
+        self.names = list(variables)
+        self.sizes = [len(variables[name]) for name in self.names]
+        self.node_limit = node_limit
+        position = {name: k for k, name in enumerate(self.names)}
+
+        self.constraints: List[Tuple[Tuple[int, ...], FrozenSet[Tuple[int, ...]]]] = [
+            (tuple(position[name] for name in scope), frozenset(tuples)) for scope, tuples in tables
+        ]
+        # Contraintes à réviser quand le domaine d'une variable change
+        self.watchers: List[List[int]] = [[] for _ in self.names]
+        for c, (scope, _) in enumerate(self.constraints):
+            for p in scope:
+                self.watchers[p].append(c)
+
+    # -------------------------
+    # Arc-consistance
+    # -------------------------
+
+    def _revise(self, domains: List[int], c: int) -> Optional[List[int]]:
+        """
+        Retire les valeurs sans support dans la contrainte c.
+        Renvoie les variables modifiées, ou None si un domaine devient vide.
+        """
+        scope, forbidden = self.constraints[c]
+        supported = [0] * len(scope)
+        for combo in product(*(_values(domains[p]) for p in scope)):
+            if combo not in forbidden:
+                for j, v in enumerate(combo):
+                    supported[j] |= 1 << v
+        changed = []
+        for j, p in enumerate(scope):
+            if supported[j] != domains[p]:
+                if not supported[j]:
+                    return None
+                domains[p] = supported[j]
+                changed.append(p)
+        return changed
+
+    def _gac(self, domains: List[int], pending: List[int]) -> bool:
+        queue = list(pending)
+        queued = set(queue)
+        while queue:
+            c = queue.pop()
+            queued.discard(c)
+            changed = self._revise(domains, c)
+            if changed is None:
+                return False
+            for p in changed:
+                for other in self.watchers[p]:
+                    if other != c and other not in queued:
+                        queue.append(other)
+                        queued.add(other)
+        return True
+
+    # -------------------------
+    # Recherche de témoins (MAC)
+    # -------------------------
+
+    def _search(self, domains: List[int], budget: List[int]) -> Optional[List[int]]:
+        budget[0] -= 1
+        if budget[0] < 0:
+            raise _BudgetExhausted()
+
+        open_vars = [p for p, d in enumerate(domains) if d & (d - 1)]
+        if not open_vars:
+            return [d.bit_length() - 1 for d in domains]
+
+        p = min(open_vars, key=lambda q: bin(domains[q]).count("1"))
+        for v in _values(domains[p]):
+            child = list(domains)
+            child[p] = 1 << v
+            if self._gac(child, self.watchers[p]):
+                solution = self._search(child, budget)
+                if solution is not None:
+                    return solution
+        return None
+
+    def arc_consistency(self, chosen: Dict[str, int], candidates: Optional[List[int]] = None) -> Optional[List[int]]:
+        """
+        Domaines (masques par variable) après arc-consistance seule, sans
+        recherche, en partant de `candidates` si fourni ; None si un domaine
+        devient vide. Toute valeur retirée est réellement impossible.
+        """
+        domains = list(candidates) if candidates is not None else [(1 << n) - 1 for n in self.sizes]
+        for k, name in enumerate(self.names):
+            if name in chosen:
+                domains[k] &= 1 << chosen[name]
+        if not all(domains) or not self._gac(domains, list(range(len(self.constraints)))):
+            return None
+        return domains
+
+    def propagate(self, chosen: Dict[str, int], candidates: Optional[List[int]] = None) -> Tuple[Dict[str, List[str]], bool, bool]:
+        """
+        Renvoie (domaines, cohérent, complet). Si `complet` est faux, les
+        domaines sont seulement un sur-ensemble des valeurs possibles.
+        `candidates` (masques par variable) restreint les valeurs de départ :
+        il ne doit exclure que des valeurs impossibles.
+        """
+        domains = self.arc_consistency(chosen, candidates)
+        if domains is None:
+            return {name: [] for name in self.names}, False, True
+
+        witnessed = [0] * len(domains)
+        budget = [self.node_limit]
+        try:
+            for p in range(len(domains)):
+                for v in _values(domains[p] & ~witnessed[p]):
+                    # Une recherche précédente a pu témoigner pour cette valeur
+                    if witnessed[p] >> v & 1:
+                        continue
+                    trial = list(domains)
+                    trial[p] = 1 << v
+                    solution = None
+                    if self._gac(trial, self.watchers[p]):
+                        solution = self._search(trial, budget)
+                    if solution is None:
+                        domains[p] &= ~(1 << v)
+                        continue
+                    for q, w in enumerate(solution):
+                        witnessed[q] |= 1 << w
+                if not domains[p]:
+                    # Aucune valeur de p n'a de solution : affectation incohérente
+                    return {name: [] for name in self.names}, False, True
+        except _BudgetExhausted:
+            return self._to_names(domains), True, False
+
+        return self._to_names(witnessed), True, True
+
+    def _to_names(self, domains: List[int]) -> Dict[str, List[str]]:
+        return {
+            name: [self.variables[name][v] for v in _values(domains[k])]
+            for k, name in enumerate(self.names)
+        }
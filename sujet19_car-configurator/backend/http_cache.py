@@ -0,0 +1,74 @@
+"""
+Cache HTTP des réponses déterministes (variantes GET de /propagate et /solve).
+
+Une réponse ne dépend que de l'affectation canonique, des paramètres de la
+requête et de la version des règles : l'ETag est une empreinte de ces
+éléments, calculable sans rien propager. Un client (navigateur, CDN, proxy)
+qui renvoie cet ETag dans `If-None-Match` reçoit un 304 sans calcul.
+
+- /propagate : ETag fort, la réponse est identique octet pour octet ;
+- /solve : ETag faible (`W/`), CP-SAT pouvant renvoyer une autre solution de
+  même coût d'un processus à l'autre.
+
+`Cache-Control: max-age` borne la durée pendant laquelle un cache peut
+resservir une réponse sans revalidation (un changement de règles change
+l'ETag, pas l'URL). Une requête `Cache-Control: no-store` reçoit une réponse
+`no-store` ; `no-cache` force une réponse complète.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+
+HTTP_MAX_AGE_SECONDS = int(os.environ.get("CONFIGURATOR_HTTP_MAX_AGE", "300"))
+
+
+def etag(rules_hash: str, kind: str, *parts: Any, weak: bool = False) -> str:
+    """
+    ETag d'une réponse : empreinte de la version des règles, du type de
+    réponse et de ses paramètres canoniques.
+    """
+    digest = hashlib.sha256(json.dumps([rules_hash, kind, *parts], separators=(",", ":")).encode("utf-8")).hexdigest()
+    tag = f'"{digest[:32]}"'
+    return f"W/{tag}" if weak else tag
+
+
+def _directives(cache_control: Optional[str]) -> set:
+    if not cache_control:
+        return set()
+    return {part.strip().split("=", 1)[0].lower() for part in cache_control.split(",") if part.strip()}
+
+
+def not_modified(headers: Any, tag: str) -> bool:
+    """
+    Vrai si `If-None-Match` désigne déjà cette réponse (comparaison faible,
+    comme le veut RFC 9110 pour If-None-Match), sauf `Cache-Control: no-cache`.
+    """
+    if "no-cache" in _directives(headers.get("cache-control")):
+        return False
+    header = headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = tag[2:] if tag.startswith("W/") else tag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def cache_headers(headers: Any, tag: str, vary: Optional[str] = None) -> Dict[str, str]:
+    """
+    En-têtes à ajouter à une réponse cacheable (200 ou 304) ; `vary` nomme
+    les en-têtes de requête dont dépend la représentation.
+    """
+    extra = {"Vary": vary} if vary else {}
+    if "no-store" in _directives(headers.get("cache-control")):
+        return {"Cache-Control": "no-store", **extra}
+    return {"ETag": tag, "Cache-Control": f"public, max-age={HTTP_MAX_AGE_SECONDS}", **extra}
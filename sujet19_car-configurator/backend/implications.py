@@ -0,0 +1,91 @@
+"""
+Matrice d'implications et d'exclusions entre options, précalculée au démarrage.
+
+Pour chaque option seule (ex. engine=electric_lr), on propage une fois et on
+garde, pour chaque autre variable, le masque des valeurs encore possibles :
+
+- une valeur absente du masque est exclue par l'option ;
+- une variable réduite à une seule valeur est imposée par l'option ;
+- une option dont la propagation échoue n'apparaît dans aucune
+  configuration (option « morte »).
+
+Avec la table compilée, la propagation est exacte. Sans table, on se limite
+à l'arc-consistance (GAC sans recherche) : certaines exclusions peuvent
+manquer, mais toutes celles de la matrice sont vraies.
+
+Le front s'en sert pour griser localement les options avant la réponse du
+serveur ; le serveur, pour écarter sans solveur les combinaisons de choix
+incompatibles deux à deux et réduire les valeurs à tester.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Propagation d'une seule option : masques par variable, ou None si elle est impossible
+SinglePropagate = Callable[[Dict[str, int]], Optional[List[int]]]
+
+
+class ImplicationMatrix:
+    def __init__(
+        self,
+        variables: Dict[str, List[str]],
+        propagate: SinglePropagate,
+        masks: Optional[List[List[Optional[List[int]]]]] = None,
+    ):
+        self.variables = variables
+        self.names = list(variables)
+        self.full = [(1 << len(variables[name])) - 1 for name in self.names]
+        # masks[k][v] : masques des valeurs possibles de chaque variable quand
+        # la variable k vaut v (None si l'option est morte). Fournis par le
+        # cache de démarrage s'il est à jour (voir compiled_cache.py).
+        if masks is None:
+            masks = [[propagate({name: v}) for v in range(len(variables[name]))] for name in self.names]
+        self.masks: List[List[Optional[List[int]]]] = masks
+
+    def candidates(self, chosen: Dict[str, int]) -> Optional[List[int]]:
+        """
+        Intersection des masques des options choisies : sur-ensemble des
+        domaines après propagation complète. None si deux choix s'excluent
+        (ou si un choix est mort), sans avoir à lancer de solveur.
+        """
+        domains = list(self.full)
+        for k, name in enumerate(self.names):
+            if name not in chosen:
+                continue
+            masks = self.masks[k][chosen[name]]
+            if masks is None:
+                return None
+            for q, mask in enumerate(masks):
+                domains[q] &= mask
+        if not all(domains):
+            return None
+        return domains
+
+    def as_json(self) -> Dict[str, Any]:
+        """
+        {"implications": {var: {valeur: {"implies": {var: valeur},
+        "excludes": {var: [valeurs]}}}}, "dead": {var: [valeurs]}}, sans les
+        entrées vides.
+        """
+        implications: Dict[str, Dict[str, Any]] = {}
+        dead: Dict[str, List[str]] = {}
+        for k, name in enumerate(self.names):
+            for v, masks in enumerate(self.masks[k]):
+                value = self.variables[name][v]
+                if masks is None:
+                    dead.setdefault(name, []).append(value)
+                    continue
+                implies: Dict[str, str] = {}
+                excludes: Dict[str, List[str]] = {}
+                for q, other in enumerate(self.names):
+                    if q == k:
+                        continue
+                    values = self.variables[other]
+                    excluded = [values[w] for w in range(len(values)) if not masks[q] >> w & 1]
+                    if excluded:
+                        excludes[other] = excluded
+                    if masks[q] & (masks[q] - 1) == 0 and len(values) > 1:
+                        implies[other] = values[masks[q].bit_length() - 1]
+                if implies or excludes:
+                    implications.setdefault(name, {})[value] = {"implies": implies, "excludes": excludes}
+        return {"implications": implications, "dead": dead}
@@ -0,0 +1,162 @@
+"""
+Treillis de propagation précalculé, servi depuis un fichier mappé en mémoire.
+
+Chaque affectation partielle est encodée en base mixte : pour une variable
+à n valeurs, le chiffre 0 signifie « non choisie » et le chiffre v + 1
+signifie « valeur v ». Pour chaque index, le fichier stocke un masque des
+valeurs encore possibles (un bit par valeur du catalogue, variables dans
+l'ordre de VARIABLES). Un masque nul signifie « incohérent ».
+
+Le fichier est généré hors ligne :
+
+    python lattice.py [chemin]
+
+puis ouvert avec mmap par chaque worker uvicorn, qui partagent ainsi les
+mêmes pages en mémoire.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from table_engine import ConfigTable
+
+
+MAGIC = b"CFGLAT01"
+# magic, empreinte des contraintes (tables_hash : variables et combinaisons
+# interdites, sans prix ni poids), nb variables, nb valeurs,
+# octets par entrée, nb entrées
+HEADER = struct.Struct("<8s32sIIIQ")
+
+
+def value_offsets(variables: Dict[str, List[str]]) -> Dict[str, int]:
+    """
+    Position du premier bit de chaque variable dans un masque de domaines.
+    """
+    offsets = {}
+    offset = 0
+    for name, values in variables.items():
+        offsets[name] = offset
+        offset += len(values)
+    return offsets
+
+
+def _layout(variables: Dict[str, List[str]]) -> Tuple[int, int, int]:
+    n_values = sum(len(values) for values in variables.values())
+    entry_bytes = (n_values + 7) // 8
+    n_entries = 1
+    for values in variables.values():
+        n_entries *= len(values) + 1
+    return n_values, entry_bytes, n_entries
+
+
+def encode_index(variables: Dict[str, List[str]], chosen: Dict[str, int]) -> int:
+    """
+    Index en base mixte d'une affectation partielle (indices de valeurs).
+    """
+    index = 0
+    for name, values in variables.items():
+        digit = chosen[name] + 1 if name in chosen else 0
+        index = index * (len(values) + 1) + digit
+    return index
+
+
+def build_lattice(table: ConfigTable) -> bytes:
+    """
+    Calcule les masques de domaines de toutes les affectations partielles,
+    dans l'ordre de encode_index.
+    """
+    _, entry_bytes, n_entries = _layout(table.variables)
+    out = bytearray(n_entries * entry_bytes)
+    n_vars = len(table.names)
+    position = [0]
+
+    def walk(k: int, mask: int) -> None:
+        if k == n_vars:
+            bits = 0
+            bit = 0
+            for value_masks in table.value_masks:
+                for vm in value_masks:
+                    if mask & vm:
+                        bits |= 1 << bit
+                    bit += 1
+            start = position[0] * entry_bytes
+            out[start:start + entry_bytes] = bits.to_bytes(entry_bytes, "little")
+            position[0] += 1
+            return
+        walk(k + 1, mask)
+        for vm in table.value_masks[k]:
+            walk(k + 1, mask & vm)
+
+    walk(0, table.valid)
+    return bytes(out)
+
+
+def write_lattice(path: str, table: ConfigTable, tables_hash: str) -> None:
+    n_values, entry_bytes, n_entries = _layout(table.variables)
+    header = HEADER.pack(MAGIC, bytes.fromhex(tables_hash), len(table.names), n_values, entry_bytes, n_entries)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(build_lattice(table))
+    # Remplacement atomique : les workers déjà lancés gardent l'ancien fichier
+    os.replace(tmp_path, path)
+
+
+class Lattice:
+    def __init__(self, variables: Dict[str, List[str]], mm: mmap.mmap, entry_bytes: int):
+        self.variables = variables
+        self.offsets = value_offsets(variables)
+        self.entry_bytes = entry_bytes
+        self._mm = mm
+
+    @classmethod
+    def open(cls, path: str, variables: Dict[str, List[str]], tables_hash: str) -> Optional["Lattice"]:
+        """
+        Ouvre le treillis, ou renvoie None s'il est absent ou ne correspond
+        plus au catalogue (règles ou variables modifiées depuis sa génération ;
+        un changement de prix ou de poids le laisse valide).
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < HEADER.size:
+            mm.close()
+            return None
+        magic, digest, n_vars, n_values, entry_bytes, n_entries = HEADER.unpack_from(mm, 0)
+        expected = _layout(variables)
+        if (
+            magic != MAGIC
+            or digest.hex() != tables_hash
+            or n_vars != len(variables)
+            or (n_values, entry_bytes, n_entries) != expected
+            or len(mm) != HEADER.size + n_entries * entry_bytes
+        ):
+            mm.close()
+            return None
+        return cls(variables, mm, entry_bytes)
+
+    def domain_mask(self, chosen: Dict[str, int]) -> int:
+        start = HEADER.size + encode_index(self.variables, chosen) * self.entry_bytes
+        return int.from_bytes(self._mm[start:start + self.entry_bytes], "little")
+
+    def propagate(self, chosen: Dict[str, int]) -> Tuple[Dict[str, List[str]], bool]:
+        bits = self.domain_mask(chosen)
+        domains: Dict[str, List[str]] = {}
+        for name, values in self.variables.items():
+            offset = self.offsets[name]
+            domains[name] = [value for v, value in enumerate(values) if bits >> (offset + v) & 1]
+        return domains, bits != 0
+
+
+if __name__ == "__main__":
+    import solver
+
+    if solver.TABLE is None:
+        sys.exit("Catalogue trop grand pour être énuméré : pas de treillis possible.")
+    output = sys.argv[1] if len(sys.argv) > 1 else solver.LATTICE_PATH
+    write_lattice(output, solver.TABLE, solver.CATALOGUE.tables_hash)
+    print(f"Treillis écrit dans {output} ({os.path.getsize(output)} octets)")
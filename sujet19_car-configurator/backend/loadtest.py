@@ -0,0 +1,288 @@
+"""
+Test de charge de l'API du configurateur.
+
+Des utilisateurs virtuels reproduisent le parcours du front (script.js) :
+remise à zéro, choix successifs d'options encore proposées, changement
+d'un choix déjà fait (qui peut rendre la configuration incohérente, suivi
+alors d'un appel à /explain), puis parfois /solve avec un objectif et la
+solution précédente comme référence. Chaque appel /propagate demande les
+compteurs par valeur, comme le front.
+
+La concurrence augmente par paliers (`--levels`) ; pour chaque palier on
+mesure le débit, le taux d'erreurs (codes HTTP, dont 429 et 504 du pool) et
+les latences p50/p95/p99 par route. Le point de saturation est le dernier
+palier où le débit progresse encore d'au moins 10 % sans que le p99 de
+/propagate dépasse `--slo-ms` ni que le taux d'erreurs dépasse
+`--max-error-rate`.
+
+Deux modes :
+
+- en processus (défaut) : l'application `main.app` est appelée via ASGI,
+  avec son pool de processus. `--search-workers 1,2,8` rejoue la montée en
+  charge pour chaque nombre de threads CP-SAT par processus ;
+- `--url http://127.0.0.1:8000` : un serveur uvicorn déjà lancé. Plus
+  fidèle (le client ne partage pas la boucle d'événements du serveur), mais
+  le nombre de threads CP-SAT est celui du serveur.
+
+Usage :
+
+    python loadtest.py --levels 1,2,4,8,16,32 --stage-seconds 5 --output load.json
+    python loadtest.py --search-workers 1,4 --pool-workers 2
+    python loadtest.py --url http://127.0.0.1:8000 --think-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from benchmark import latency_summary
+
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32)
+OBJECTIVES = ("any", "any", "cheapest", "premium", "closest")
+# Progression minimale du débit d'un palier au suivant avant saturation
+SATURATION_GAIN = 1.10
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, int] = {}
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, route: str, latency: float, status: str) -> None:
+        self.requests += 1
+        self.latencies.setdefault(route, []).append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status != "200":
+            self.errors += 1
+
+
+async def _call(client: httpx.AsyncClient, stats: StageStats, route: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    started = time.perf_counter()
+    try:
+        response = await client.post(f"/{route}", json=payload)
+        status = str(response.status_code)
+    except httpx.HTTPError as exc:
+        stats.record(route, time.perf_counter() - started, type(exc).__name__)
+        return None
+    stats.record(route, time.perf_counter() - started, status)
+    return response.json() if response.status_code == 200 else None
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    variables: Dict[str, List[str]],
+    stats: StageStats,
+    stop_at: float,
+    think: float,
+    rng: random.Random,
+) -> None:
+    """
+    Parcours d'un utilisateur du front, répété jusqu'à `stop_at`.
+    """
+    last_solution: Optional[Dict[str, str]] = None
+
+    async def propagate(assignments: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        data = await _call(client, stats, "propagate", {"assignments": assignments, "with_counts": True})
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+        return data
+
+    while time.monotonic() < stop_at:
+        # Réinitialiser
+        assignments: Dict[str, str] = {}
+        data = await propagate(assignments)
+        for _ in range(rng.randint(2, len(variables))):
+            if data is None or time.monotonic() >= stop_at:
+                break
+            free = [name for name in variables if name not in assignments and data["domains"].get(name)]
+            if assignments and (not free or rng.random() < 0.2):
+                # Changer un choix déjà fait, sans regarder les options proposées
+                name = rng.choice(list(assignments))
+                previous = assignments[name]
+                assignments[name] = rng.choice(variables[name])
+            elif free:
+                name = rng.choice(free)
+                previous = None
+                assignments[name] = rng.choice(data["domains"][name])
+            else:
+                break
+            data = await propagate(assignments)
+            if data is not None and not data["valid"]:
+                await _call(client, stats, "explain", {"assignments": assignments})
+                # L'utilisateur revient sur son choix
+                if previous is None:
+                    del assignments[name]
+                else:
+                    assignments[name] = previous
+                data = await propagate(assignments)
+        if time.monotonic() < stop_at and rng.random() < 0.5:
+            result = await _call(
+                client,
+                stats,
+                "solve",
+                {
+                    "assignments": assignments,
+                    "objective": rng.choice(OBJECTIVES),
+                    "reference": last_solution,
+                    "hint": last_solution,
+                },
+            )
+            if result is not None and result.get("configuration"):
+                last_solution = result["configuration"]
+
+
+async def run_stage(
+    client: httpx.AsyncClient,
+    variables: Dict[str, List[str]],
+    concurrency: int,
+    seconds: float,
+    think: float,
+    seed: int,
+) -> Dict[str, Any]:
+    stats = StageStats()
+    started = time.monotonic()
+    stop_at = started + seconds
+    await asyncio.gather(
+        *(
+            virtual_user(client, variables, stats, stop_at, think, random.Random(seed * 1000 + k))
+            for k in range(concurrency)
+        )
+    )
+    elapsed = time.monotonic() - started
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": stats.requests,
+        "throughput_rps": round(stats.requests / elapsed, 1),
+        "error_rate": round(stats.errors / stats.requests, 4) if stats.requests else 0.0,
+        "statuses": stats.statuses,
+        "routes": {
+            route: {"requests": len(samples), **latency_summary(samples)}
+            for route, samples in sorted(stats.latencies.items())
+        },
+    }
+
+
+def saturation(stages: List[Dict[str, Any]], slo_ms: float, max_error_rate: float) -> Dict[str, Any]:
+    """
+    Dernier palier où le débit progresse encore et où /propagate respecte le SLO.
+    """
+    best: Optional[Dict[str, Any]] = None
+    for stage in stages:
+        p99 = stage["routes"].get("propagate", {}).get("p99_ms", 0.0)
+        if p99 > slo_ms or stage["error_rate"] > max_error_rate:
+            break
+        if best is not None and stage["throughput_rps"] < best["throughput_rps"] * SATURATION_GAIN:
+            break
+        best = stage
+    if best is None:
+        return {"concurrency": 0, "throughput_rps": 0.0}
+    return {"concurrency": best["concurrency"], "throughput_rps": best["throughput_rps"]}
+
+
+async def ramp(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict[str, Any]:
+    response = await client.get("/catalogue")
+    variables = response.json()["variables"]
+    stages = []
+    for level in args.levels:
+        stage = await run_stage(client, variables, level, args.stage_seconds, args.think_ms / 1000, args.seed)
+        stages.append(stage)
+        routes = ", ".join(f"{route} p99={r['p99_ms']:.1f}ms" for route, r in stage["routes"].items())
+        print(
+            f"  {level:4d} utilisateurs : {stage['throughput_rps']:8.1f} req/s, "
+            f"erreurs {stage['error_rate']:.2%}, {routes}",
+            file=sys.stderr,
+        )
+    pool_stats = (await client.get("/pool/stats")).json()
+    return {"pool": pool_stats, "stages": stages, "saturation": saturation(stages, args.slo_ms, args.max_error_rate)}
+
+
+@asynccontextmanager
+async def in_process_client(search_workers: int) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Client ASGI sur `main.app`, avec le cycle de vie de l'application (pool).
+    """
+    import main
+    import pool
+    import solver
+
+    solver.NUM_SEARCH_WORKERS = search_workers
+    pool.POOL_SEARCH_WORKERS = search_workers
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            yield client
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": "url" if args.url else "asgi",
+        "cpu_count": os.cpu_count(),
+        "levels": args.levels,
+        "stage_seconds": args.stage_seconds,
+        "think_ms": args.think_ms,
+        "slo_ms": args.slo_ms,
+        "max_error_rate": args.max_error_rate,
+        "runs": [],
+    }
+    limits = httpx.Limits(max_connections=max(args.levels))
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            print(f"{args.url}", file=sys.stderr)
+            report["runs"].append({"search_workers": None, **await ramp(client, args)})
+        return report
+
+    for search_workers in args.search_workers:
+        print(f"num_search_workers = {search_workers}", file=sys.stderr)
+        async with in_process_client(search_workers) as client:
+            client.timeout = httpx.Timeout(args.timeout)
+            report["runs"].append({"search_workers": search_workers, **await ramp(client, args)})
+    return report
+
+
+def _ints(text: str) -> List[int]:
+    return [int(n) for n in text.split(",") if n]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge de l'API du configurateur")
+    parser.add_argument("--url", help="serveur déjà lancé (sinon : main.app en processus)")
+    parser.add_argument("--levels", type=_ints, default=list(DEFAULT_LEVELS), help="utilisateurs simultanés par palier")
+    parser.add_argument("--stage-seconds", type=float, default=5.0)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="temps de réflexion moyen entre deux clics")
+    parser.add_argument("--search-workers", type=_ints, default=[1, 8], help="threads CP-SAT par processus (mode ASGI)")
+    parser.add_argument("--pool-workers", type=int, help="processus solveurs (mode ASGI)")
+    parser.add_argument("--slo-ms", type=float, default=200.0, help="p99 maximal de /propagate")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="taux d'erreurs maximal d'un palier")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats (sinon sortie standard)")
+    args = parser.parse_args()
+
+    if args.pool_workers is not None:
+        # Lu à l'import de pool.py / main.py
+        os.environ["CONFIGURATOR_POOL_WORKERS"] = str(args.pool_workers)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,72 @@
-from fastapi import FastAPI
+import asyncio
+import io
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Literal, Optional, Any
+
+import domain_codec
+import http_cache
+import metrics
+import realtime
+from orders import ORDER_CHUNK_SIZE, OrderReader, OrderStats
+from pool import DEFAULT_DEADLINE_SECONDS, POOL_WORKERS, PoolSaturated, SolverPool
+from solver import (
+    CATALOGUES,
+    LABELS,
+    IMPLICATIONS,
+    ORDERS,
+    RULES_HASH,
+    SESSIONS,
+    VARIABLES,
+    cache_stats,
+    canonical_assignments,
+    configuration_price,
+    count_configurations,
+    explain_conflict,
+    group_assignments,
+    list_configurations,
+    propagate_domains,
+    propagate_domains_batch,
+    propagate_with_counts,
+    propagation_needs_solver,
+    rejected_by_implications,
+    repair_configuration,
+    repair_weights,
+    solve_configuration,
+)
+
+# Pool de processus solveurs, démarré avec l'application (None si désactivé
+# via CONFIGURATOR_POOL_WORKERS=0 : les calculs tournent alors dans le threadpool)
+POOL: Optional[SolverPool] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global POOL
+    if POOL_WORKERS > 0:
+        POOL = SolverPool()
+        await POOL.warm_up()
+    yield
+    if POOL is not None:
+        POOL.shutdown()
+        POOL = None
 
-from solver import propagate_domains, solve_configuration
 
-app = FastAPI(title="Car Configurator CSP API")
+# Réponse de /implications, identique pour toute la durée de vie du processus
+IMPLICATIONS_JSON = IMPLICATIONS.as_json()
+
+# Encodage compact des domaines (Accept: application/x-configurator-domains)
+CODEC = domain_codec.DomainCodec(VARIABLES)
+
+app = FastAPI(title="Car Configurator CSP API", lifespan=lifespan)
 
 # CORS pour permettre l'accès depuis le front (localhost:5173, 3000, file://, etc.)
 origins = [
@@ -19,6 +80,9 @@ origins = [
     "null",  # file:// origin quand on ouvre index.html directement
 ]
 
+# Durée par route et en-tête Server-Timing (voir metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -30,16 +94,82 @@ app.add_middleware(
 
 class ConfigRequest(BaseModel):
     assignments: Dict[str, Optional[str]]
+    # /propagate : ajoute le nombre de configurations par valeur restante
+    with_counts: bool = False
+
+
+class SolveRequest(ConfigRequest):
+    # any : première configuration valide ; cheapest / premium : prix min / max ;
+    # closest : distance pondérée minimale à `reference`
+    objective: Literal["any", "cheapest", "premium", "closest"] = "any"
+    reference: Optional[Dict[str, Optional[str]]] = None
+    # Dernière solution connue, pour démarrer CP-SAT à chaud
+    hint: Optional[Dict[str, Optional[str]]] = None
+
+
+class RepairRequest(BaseModel):
+    assignments: Dict[str, Optional[str]]
+    # Variables dans l'ordre où elles ont été choisies (la plus ancienne d'abord) :
+    # un choix récent coûte plus cher à modifier
+    history: Optional[List[str]] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[Dict[str, Optional[str]]]
 
 
 class PropagationResponse(BaseModel):
     domains: Dict[str, List[str]]
     valid: bool
+    counts: Optional[Dict[str, Dict[str, int]]] = None
+
+
+class CountResponse(BaseModel):
+    count: int
+
+
+class ConfigurationsResponse(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    configurations: List[Dict[str, str]]
+
+
+class ExplanationResponse(BaseModel):
+    valid: bool
+    # Sous-ensemble minimal des choix incompatibles entre eux
+    conflict: Optional[Dict[str, str]] = None
+    # Règles du catalogue en cause
+    rules: List[str] = []
+    # Faux si un test CP-SAT n'a pas conclu : conflit et règles non minimaux
+    minimal: bool = True
+
+
+class SessionChange(BaseModel):
+    variable: str
+    value: Optional[str] = None
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+    assignments: Dict[str, str]
+    domains: Dict[str, List[str]]
+    valid: bool
+
+
+class RepairResponse(BaseModel):
+    status: str
+    # Choix de l'utilisateur après réparation, et configuration complète correspondante
+    assignments: Optional[Dict[str, str]] = None
+    configuration: Optional[Dict[str, str]] = None
+    changes: Dict[str, Dict[str, str]] = {}
+    cost: int = 0
 
 
 class SolveResponse(BaseModel):
     configuration: Optional[Dict[str, str]]
     status: str
+    price: Optional[int] = None
 
 
 @app.get("/")
@@ -47,23 +177,598 @@ def root():
     return {"message": "Car Configurator API is running"}
 
 
+@app.get("/catalogue")
+def api_catalogue() -> Dict[str, Any]:
+    """
+    Variables, valeurs et libellés du catalogue (source unique pour le front),
+    et dictionnaire de l'encodage compact des domaines.
+    """
+    return {"version": RULES_HASH, "variables": VARIABLES, "labels": LABELS, "dictionary": CODEC.dictionary()}
+
+
+@app.get("/implications")
+def api_implications() -> Dict[str, Any]:
+    """
+    Pour chaque option, valeurs imposées et exclues sur les autres variables
+    (calculées une fois au démarrage), et options impossibles.
+    """
+    return {"version": RULES_HASH, **IMPLICATIONS_JSON}
+
+
+async def _dispatch(kind: str, *args: Any) -> Any:
+    """
+    Exécute un calcul du solveur dans le pool (429 si saturé, 504 si l'échéance
+    est dépassée), ou dans le threadpool si le pool est désactivé.
+    """
+    if POOL is None:
+        func = {
+            "propagate": propagate_domains,
+            "solve": solve_configuration,
+            "repair": repair_configuration,
+            "explain": explain_conflict,
+        }[kind]
+        return await run_in_threadpool(func, *args)
+    try:
+        return await POOL.run(kind, *args)
+    except PoolSaturated:
+        raise HTTPException(status_code=429, detail="Solveur saturé, réessayez plus tard.")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Délai de résolution dépassé.")
+
+
+async def _propagation(assignments: Dict[str, Optional[str]], with_counts: bool) -> Dict[str, Any]:
+    """
+    Domaines (et compteurs si demandés et disponibles sans solveur) pour des
+    choix partiels ; le calcul part dans le pool seulement s'il faut un solveur.
+    """
+    if with_counts and not propagation_needs_solver():
+        domains, is_consistent, counts = propagate_with_counts(assignments)
+        return {"domains": domains, "valid": is_consistent, "counts": counts}
+    if propagation_needs_solver():
+        if rejected_by_implications(assignments):
+            # Deux choix s'excluent : réponse immédiate, sans passer par le pool
+            return {"domains": {name: [] for name in VARIABLES}, "valid": False}
+        domains, is_consistent = await _dispatch("propagate", assignments)
+    else:
+        # Lecture du treillis ou de la table : plus rapide qu'un aller-retour vers le pool
+        domains, is_consistent = propagate_domains(assignments)
+    return {"domains": domains, "valid": is_consistent}
+
+
+def _compact(result: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Réponse de propagation en masques de bits (voir domain_codec.py).
+    """
+    body = CODEC.encode(result["domains"], result["valid"], result.get("counts"))
+    return Response(content=body, media_type=domain_codec.MEDIA_TYPE, headers=headers)
+
+
 @app.post("/propagate", response_model=PropagationResponse)
-def api_propagate(req: ConfigRequest) -> Any:
+async def api_propagate(req: ConfigRequest, request: Request) -> Any:
     """
     Prend des affectations partielles et renvoie,
-    pour chaque variable, les valeurs encore possibles.
+    pour chaque variable, les valeurs encore possibles
+    (en masques de bits si `Accept: application/x-configurator-domains`).
     """
-    domains, is_consistent = propagate_domains(req.assignments)
-    return {"domains": domains, "valid": is_consistent}
+    result = await _propagation(req.assignments, req.with_counts)
+    if domain_codec.accepts(request.headers):
+        return _compact(result)
+    return result
+
+
+def _query_assignments(request: Request, prefix: str = "") -> Dict[str, Optional[str]]:
+    """
+    Choix passés en paramètres de requête : `?model=suv&engine=diesel_2_0`
+    (ou `?ref.model=suv` avec prefix="ref.").
+    """
+    params = request.query_params
+    return {name: params[prefix + name] for name in VARIABLES if params.get(prefix + name)}
+
+
+def _not_modified(request: Request, tag: str, vary: Optional[str] = None) -> Optional[Response]:
+    if http_cache.not_modified(request.headers, tag):
+        return Response(status_code=304, headers=http_cache.cache_headers(request.headers, tag, vary))
+    return None
+
+
+@app.get("/propagate", response_model=PropagationResponse)
+async def api_propagate_get(request: Request, response: Response, with_counts: bool = False) -> Any:
+    """
+    Comme POST /propagate, avec les choix dans l'URL (`?model=suv&pack=tech`) :
+    réponse cacheable, ETag fort et 304 sur If-None-Match. L'encodage
+    (JSON ou compact) fait partie de l'ETag, d'où `Vary: Accept`.
+    """
+    assignments = _query_assignments(request)
+    compact = domain_codec.accepts(request.headers)
+    encoding = CODEC.version if compact else "json"
+    tag = http_cache.etag(RULES_HASH, "propagate", canonical_assignments(assignments), with_counts, encoding)
+    cached = _not_modified(request, tag, vary="Accept")
+    if cached is not None:
+        return cached
+    result = await _propagation(assignments, with_counts)
+    headers = http_cache.cache_headers(request.headers, tag, vary="Accept")
+    if compact:
+        return _compact(result, headers)
+    response.headers.update(headers)
+    return result
+
+
+@app.websocket("/ws")
+async def ws_configuration(websocket: WebSocket) -> None:
+    """
+    Canal temps réel : l'état de la configuration est gardé par connexion,
+    les rafales de changements sont regroupées, une propagation rendue
+    obsolète par un nouveau changement est annulée, et seules les
+    différences de domaines sont envoyées (protocole décrit dans realtime.py).
+    """
+    await websocket.accept()
+    live = realtime.LiveConfiguration(VARIABLES)
+    changed = asyncio.Event()
+    realtime.count("connections")
+
+    async def receive() -> None:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            try:
+                # Trame texte ou binaire : JSON invalide signalé, connexion gardée
+                message = json.loads(frame.get("text") or frame.get("bytes") or "")
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                await websocket.send_json({"type": "error", "detail": "JSON invalide"})
+                continue
+            try:
+                live.apply(message)
+            except ValueError as exc:
+                await websocket.send_json({"type": "error", "detail": str(exc)})
+                continue
+            changed.set()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        # État initial, puis une propagation par rafale de changements
+        changed.set()
+        while True:
+            waiter = asyncio.create_task(changed.wait())
+            await asyncio.wait({waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if receiver.done():
+                break
+            await asyncio.sleep(realtime.COALESCE_SECONDS)
+            changed.clear()
+            if live.pending > 1:
+                realtime.count("coalesced", live.pending - 1)
+            live.pending = 0
+            seq, assignments = live.seq, dict(live.assignments)
+
+            compute = asyncio.create_task(_propagation(assignments, True))
+            waiter = asyncio.create_task(changed.wait())
+            await asyncio.wait({compute, waiter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            if not compute.done():
+                # Changement arrivé pendant le calcul (ou client parti) : résultat obsolète
+                compute.cancel()
+                realtime.count("cancelled")
+                if receiver.done():
+                    break
+                continue
+            try:
+                result = compute.result()
+            except HTTPException as exc:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": exc.detail})
+                continue
+            await websocket.send_json(live.push(seq, assignments, result["domains"], result["valid"], result.get("counts")))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        # Exception du récepteur lue ici : une déconnexion n'est pas une
+        # erreur de tâche ; toute autre exception remonte
+        if receiver.done() and not receiver.cancelled():
+            exc = receiver.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                raise exc
+
+
+def _batch_line(positions: List[int], domains: Dict[str, List[str]], is_consistent: bool) -> str:
+    return json.dumps({"indices": positions, "domains": domains, "valid": is_consistent}, ensure_ascii=False) + "\n"
+
+
+# Affectations distinctes par calcul envoyé au pool pour /propagate/batch :
+# un délai dépassé ne fait perdre que ce paquet
+BATCH_CHUNK_SIZE = int(os.environ.get("CONFIGURATOR_BATCH_CHUNK", "8"))
+
+
+async def _batch_from_pool(items: List[Dict[str, Optional[str]]]):
+    """
+    Répartit les affectations distinctes en petits paquets sur les processus
+    du pool (au plus deux paquets en cours par processus) et produit les
+    lignes NDJSON dans l'ordre où les paquets se terminent. L'échéance d'un
+    paquet est celle d'une propagation multipliée par sa taille ; un paquet
+    non traité donne une ligne {"indices": [...], "error": ...}.
+    """
+    groups = group_assignments(items)
+    size = max(1, BATCH_CHUNK_SIZE)
+    chunks = [groups[k:k + size] for k in range(0, len(groups), size)]
+    running = asyncio.Semaphore(POOL.workers * 2)
+
+    async def run_chunk(chunk):
+        try:
+            async with running:
+                deadline = DEFAULT_DEADLINE_SECONDS * len(chunk)
+                results = await POOL.run("propagate_batch", [dict(key) for key, _ in chunk], deadline=deadline)
+        except (PoolSaturated, asyncio.TimeoutError):
+            return chunk, None
+        return chunk, results
+
+    for next_done in asyncio.as_completed([run_chunk(chunk) for chunk in chunks]):
+        chunk, results = await next_done
+        if results is None:
+            positions = sorted(p for _, chunk_positions in chunk for p in chunk_positions)
+            yield json.dumps({"indices": positions, "error": "Paquet non traité (solveur saturé ou délai dépassé)."}) + "\n"
+            continue
+        for (_, positions), (domains, is_consistent) in zip(chunk, results):
+            yield _batch_line(positions, domains, is_consistent)
+
+
+@app.post("/propagate/batch")
+async def api_propagate_batch(req: BatchRequest) -> StreamingResponse:
+    """
+    Propage un lot d'affectations partielles. Réponse NDJSON, une ligne par
+    affectation distincte : {"indices": [...], "domains": {...}, "valid": ...},
+    où `indices` donne les positions concernées dans `items`.
+    """
+    if POOL is not None and propagation_needs_solver():
+        lines = _batch_from_pool(req.items)
+    else:
+        # Itérateur synchrone : Starlette le consomme dans le threadpool
+        lines = (
+            _batch_line(positions, domains, is_consistent)
+            for positions, domains, is_consistent in propagate_domains_batch(req.items)
+        )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+# Corps des requêtes /orders/validate gardé en mémoire jusqu'à cette taille,
+# puis sur disque
+ORDERS_SPOOL_BYTES = 1024 * 1024
+
+
+async def _repair_orders(results: List[Dict[str, Any]]) -> None:
+    """
+    Réparations d'un paquet de commandes. Sur la table, elles se font
+    directement ; sinon en parallèle dans le pool (une résolution par
+    commande invalide distincte), avec un nombre de résolutions en cours
+    limité pour laisser de la place aux requêtes interactives.
+    """
+    if not propagation_needs_solver():
+        await run_in_threadpool(ORDERS.repair, results)
+        return
+    running = asyncio.Semaphore(POOL.workers * 2 if POOL is not None else 1)
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for result in results:
+        if result["status"] == "invalid":
+            groups.setdefault(tuple(sorted(result["assignments"].items())), []).append(result)
+
+    async def repair(key, group):
+        try:
+            async with running:
+                config, _ = await _dispatch("repair", dict(key))
+        except HTTPException:
+            config = None
+        for result in group:
+            ORDERS.apply_repair(result, config)
+
+    await asyncio.gather(*(repair(key, group) for key, group in groups.items()))
+
+
+@app.post("/orders/validate")
+async def api_orders_validate(
+    request: Request,
+    format: Optional[Literal["csv", "jsonl"]] = Query(None),
+    repair: bool = Query(True),
+) -> StreamingResponse:
+    """
+    Valide un fichier de commandes (corps CSV ou JSONL, voir orders.py) et
+    répare les commandes invalides. Réponse NDJSON, une ligne par commande,
+    puis une ligne {"summary": {...}} avec le débit en commandes par seconde.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    # Corps recopié avant de répondre : la mémoire reste bornée et la lecture
+    # ne concurrence pas l'envoi de la réponse
+    body = tempfile.SpooledTemporaryFile(max_size=ORDERS_SPOOL_BYTES)
+    async for data in request.stream():
+        body.write(data)
+    body.seek(0)
+
+    async def lines():
+        reader = OrderReader(fmt)
+        stats = OrderStats()
+        text = io.TextIOWrapper(body, encoding="utf-8", newline="")
+        try:
+            while True:
+                chunk = []
+                for line in text:
+                    order = reader.parse(line)
+                    if order is not None:
+                        chunk.append(order)
+                    if len(chunk) >= ORDER_CHUNK_SIZE:
+                        break
+                if not chunk:
+                    break
+                results = await run_in_threadpool(ORDERS.check, chunk)
+                if repair:
+                    await _repair_orders(results)
+                out = []
+                for result in results:
+                    result.pop("assignments", None)
+                    stats.add(result)
+                    out.append(json.dumps(result, ensure_ascii=False) + "\n")
+                yield "".join(out)
+        finally:
+            text.close()
+        yield json.dumps({"summary": stats.summary()}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/count", response_model=CountResponse)
+def api_count(req: ConfigRequest) -> Any:
+    """
+    Nombre de configurations complètes encore possibles avec les choix partiels.
+    """
+    count = count_configurations(req.assignments)
+    if count is None:
+        raise HTTPException(status_code=501, detail="Comptage indisponible pour ce catalogue.")
+    return {"count": count}
+
+
+@app.post("/configurations", response_model=ConfigurationsResponse)
+def api_configurations(
+    req: ConfigRequest,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+) -> Any:
+    """
+    Liste paginée des configurations complètes compatibles avec les choix partiels.
+    """
+    result = list_configurations(req.assignments, offset, limit)
+    if result is None:
+        raise HTTPException(status_code=501, detail="Énumération indisponible pour ce catalogue.")
+    total, configurations = result
+    return {"total": total, "offset": offset, "limit": limit, "configurations": configurations}
+
+
+@app.post("/explain", response_model=ExplanationResponse)
+async def api_explain(req: ConfigRequest) -> Any:
+    """
+    Pour des choix incohérents, indique quels choix retirer (conflit minimal)
+    et quelles règles sont en cause.
+    """
+    if propagation_needs_solver():
+        # QuickXplain par CP-SAT : dans le pool, avec ses 429 et son échéance
+        explanation = await _dispatch("explain", req.assignments)
+    else:
+        # Tests de cohérence sur la table : quelques ET binaires
+        explanation = await run_in_threadpool(explain_conflict, req.assignments)
+    if explanation is None:
+        return {"valid": True}
+    return {"valid": False, **explanation}
 
 
 @app.post("/solve", response_model=SolveResponse)
-def api_solve(req: ConfigRequest) -> Any:
+async def api_solve(req: SolveRequest) -> Any:
+    """
+    Tente de compléter la configuration à partir des choix partiels,
+    selon l'objectif demandé.
+    """
+    config, status = await _dispatch("solve", req.assignments, req.objective, req.reference, req.hint)
+    price = configuration_price(config) if config is not None else None
+    return {"configuration": config, "status": status, "price": price}
+
+
+@app.post("/repair", response_model=RepairResponse)
+async def api_repair(req: RepairRequest) -> Any:
+    """
+    Pour des choix incohérents, configuration valide la plus proche : le
+    moins de choix modifiés possible, les plus récents (d'après `history`)
+    étant les plus coûteux à modifier.
+    """
+    if propagation_needs_solver():
+        config, status = await _dispatch("repair", req.assignments, req.history)
+    else:
+        # Recherche exacte sur la table : quelques ET binaires, sans passer par le pool
+        config, status = repair_configuration(req.assignments, req.history)
+    if config is None:
+        return {"status": status}
+    weights = repair_weights(req.assignments, req.history)
+    chosen = {name: req.assignments[name] for name in weights}
+    changes = {name: {"from": value, "to": config[name]} for name, value in chosen.items() if config[name] != value}
+    return {
+        "status": status,
+        "assignments": {name: config[name] for name in chosen},
+        "configuration": config,
+        "changes": changes,
+        "cost": sum(weights[name] for name in changes),
+    }
+
+
+@app.get("/solve", response_model=SolveResponse)
+async def api_solve_get(
+    request: Request,
+    response: Response,
+    objective: Literal["any", "cheapest", "premium", "closest"] = "any",
+) -> Any:
+    """
+    Comme POST /solve, avec les choix dans l'URL ; `ref.<variable>` et
+    `hint.<variable>` donnent `reference` et `hint`. Réponse cacheable, avec
+    un ETag faible (une autre solution de même coût reste équivalente).
+    """
+    assignments = _query_assignments(request)
+    reference = _query_assignments(request, "ref.")
+    hint = _query_assignments(request, "hint.")
+    tag = http_cache.etag(
+        RULES_HASH,
+        "solve",
+        canonical_assignments(assignments),
+        objective,
+        canonical_assignments(reference) if objective == "closest" else [],
+        weak=True,
+    )
+    cached = _not_modified(request, tag)
+    if cached is not None:
+        return cached
+    config, status = await _dispatch("solve", assignments, objective, reference or None, hint or None)
+    price = configuration_price(config) if config is not None else None
+    if status in ("OPTIMAL", "INFEASIBLE") or (objective == "any" and status == "FEASIBLE"):
+        response.headers.update(http_cache.cache_headers(request.headers, tag))
+    else:
+        # Limite de temps atteinte : un nouvel appel peut faire mieux
+        response.headers["Cache-Control"] = "no-store"
+    return {"configuration": config, "status": status, "price": price}
+
+
+def _catalogue(catalogue_id: str):
+    try:
+        return CATALOGUES.get(catalogue_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Catalogue inconnu : {catalogue_id}")
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Catalogue invalide : {exc}")
+
+
+@app.get("/catalogues")
+def api_catalogues() -> Dict[str, Any]:
+    """
+    Catalogues disponibles et état du registre (chargés, moteurs partagés, mémoire).
+    """
+    return {"catalogues": CATALOGUES.ids(), **CATALOGUES.stats()}
+
+
+@app.get("/catalogues/{catalogue_id}")
+def api_catalogue_by_id(catalogue_id: str) -> Dict[str, Any]:
+    return _catalogue(catalogue_id).describe()
+
+
+@app.post("/catalogues/{catalogue_id}/propagate", response_model=PropagationResponse)
+async def api_catalogue_propagate(catalogue_id: str, req: ConfigRequest) -> Any:
+    """
+    Comme /propagate, pour un catalogue du registre. Sans table (GAC puis
+    CP-SAT), le calcul part dans le pool, avec ses 429 et son échéance.
+    """
+    loaded = await run_in_threadpool(_catalogue, catalogue_id)
+    if POOL is not None and loaded.needs_solver():
+        try:
+            return await _dispatch("catalogue_propagate", catalogue_id, req.assignments, req.with_counts)
+        except KeyError:
+            # Fichier supprimé entre-temps
+            raise HTTPException(status_code=404, detail=f"Catalogue inconnu : {catalogue_id}")
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=f"Catalogue invalide : {exc}")
+    return await run_in_threadpool(loaded.propagate, req.assignments, req.with_counts)
+
+
+def _session_call(func, *args) -> Any:
+    try:
+        return func(*args)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée.")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.post("/session", response_model=SessionResponse)
+def api_session_create() -> Any:
+    """
+    Ouvre une session de configuration vide.
+    """
+    return SESSIONS.create()
+
+
+@app.get("/session/{session_id}", response_model=SessionResponse)
+def api_session_state(session_id: str) -> Any:
+    return _session_call(SESSIONS.state, session_id)
+
+
+@app.post("/session/{session_id}/set", response_model=SessionResponse)
+def api_session_set(session_id: str, change: SessionChange) -> Any:
+    """
+    Applique un seul choix ; seule sa conséquence est propagée.
+    """
+    return _session_call(SESSIONS.set, session_id, change.variable, change.value)
+
+
+@app.post("/session/{session_id}/unset", response_model=SessionResponse)
+def api_session_unset(session_id: str, change: SessionChange) -> Any:
+    """
+    Retire un choix (les choix faits après lui sont réappliqués).
+    """
+    return _session_call(SESSIONS.unset, session_id, change.variable)
+
+
+@app.delete("/session/{session_id}")
+def api_session_delete(session_id: str) -> Dict[str, str]:
+    SESSIONS.delete(session_id)
+    return {"message": "Session supprimée"}
+
+
+@app.get("/pool/stats")
+def api_pool_stats() -> Dict[str, Any]:
+    """
+    État du pool de processus solveurs.
+    """
+    if POOL is None:
+        return {"workers": 0}
+    return POOL.stats()
+
+
+@app.get("/cache/stats")
+def api_cache_stats() -> Dict[str, Any]:
+    """
+    Compteurs des caches de propagation et de résolution.
+    """
+    return cache_stats()
+
+
+def _service_metrics() -> List[str]:
+    lines = metrics.format_samples(
+        "configurator_sessions", "Sessions de configuration ouvertes", "gauge",
+        [({}, SESSIONS.stats()["sessions"])],
+    )
+    lines += metrics.format_samples(
+        "configurator_ws_events_total", "Événements du canal WebSocket", "counter",
+        [({"event": event}, n) for event, n in realtime.stats().items()],
+    )
+    registry = CATALOGUES.stats()
+    lines += metrics.format_samples(
+        "configurator_catalogues_loaded", "Catalogues chargés dans le registre", "gauge", [({}, len(registry["loaded"]))]
+    )
+    lines += metrics.format_samples(
+        "configurator_catalogue_memory_bytes", "Mémoire estimée des moteurs de catalogue", "gauge",
+        [({}, registry["memory_bytes"])],
+    )
+    if POOL is not None:
+        stats = POOL.stats()
+        lines += metrics.format_samples(
+            "configurator_pool_pending", "Calculs en cours dans le pool", "gauge", [({}, stats["pending"])]
+        )
+        lines += metrics.format_samples(
+            "configurator_pool_requests_total", "Calculs soumis au pool par issue", "counter",
+            [({"outcome": outcome}, stats[outcome]) for outcome in ("completed", "rejected", "timeouts")],
+        )
+    return lines
+
+
+metrics.register_collector("service", _service_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def api_metrics() -> PlainTextResponse:
     """
-    Tente de compléter la configuration à partir des choix partiels.
+    Métriques au format Prometheus (durées par route et par étape, résolutions
+    CP-SAT, caches, pool).
     """
-    config, status = solve_configuration(req.assignments)
-    return {"configuration": config, "status": status}
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/ping")
@@ -0,0 +1,278 @@
+"""
+Instrumentation du backend : histogrammes et compteurs au format Prometheus,
+et traces par requête.
+
+- `span(nom)` mesure une étape (construction du modèle, propagation,
+  résolution...) : la durée alimente l'histogramme
+  `configurator_span_seconds{span=...}` et, si une trace est ouverte pour la
+  requête en cours, s'y ajoute (l'API la renvoie dans l'en-tête
+  `Server-Timing`) ;
+- `record_solve(solver, status)` est appelé après chaque `CpSolver.Solve` et
+  relève les champs de la réponse CP-SAT (temps, temps déterministe,
+  branches, conflits) ;
+- les traces suivent la requête dans le threadpool (contextvars) ; les
+  processus du pool renvoient leurs événements avec le résultat, rejoués
+  ici par `replay`.
+
+Le coût est de quelques microsecondes par mesure (deux lectures d'horloge,
+un verrou, une recherche dichotomique). `CONFIGURATOR_METRICS=0` désactive
+tout.
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+METRICS_ENABLED = os.environ.get("CONFIGURATOR_METRICS", "1") != "0"
+
+# Bornes (en secondes) des histogrammes de durée
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Événement de trace : ("span", nom, secondes) ou ("solve", statut, champs)
+Event = Tuple[str, str, Any]
+
+_TRACE: contextvars.ContextVar[Optional[List[Event]]] = contextvars.ContextVar("configurator_trace", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Par jeu de labels : [effectifs par borne (+Inf en dernier), somme, total]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        k = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][k] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "configurator_request_seconds", "Durée de traitement des requêtes HTTP", ("method", "route", "status")
+)
+SPAN_SECONDS = Histogram("configurator_span_seconds", "Durée des étapes internes", ("span",))
+SOLVE_SECONDS = Histogram("configurator_solve_seconds", "Temps réel des appels CpSolver.Solve", ("status",))
+SOLVE_DETERMINISTIC = Histogram(
+    "configurator_solve_deterministic_seconds", "Temps déterministe CP-SAT par résolution", ("status",)
+)
+SOLVES = Counter("configurator_solves_total", "Appels à CpSolver.Solve", ("status",))
+SOLVE_BRANCHES = Counter("configurator_solve_branches_total", "Branches explorées par CP-SAT")
+SOLVE_CONFLICTS = Counter("configurator_solve_conflicts_total", "Conflits rencontrés par CP-SAT")
+
+_METRICS = [REQUEST_SECONDS, SPAN_SECONDS, SOLVE_SECONDS, SOLVE_DETERMINISTIC, SOLVES, SOLVE_BRANCHES, SOLVE_CONFLICTS]
+
+# Sources de compteurs externes (caches, pool) : nom -> fonction renvoyant des lignes
+_COLLECTORS: Dict[str, Callable[[], List[str]]] = {}
+
+
+def format_samples(name: str, help_text: str, kind: str, samples: List[Tuple[Dict[str, str], float]]) -> List[str]:
+    """
+    Lignes Prometheus d'une métrique calculée à la volée (compteur ou jauge).
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value:g}")
+    return lines
+
+
+def register_collector(name: str, collect: Callable[[], List[str]]) -> None:
+    _COLLECTORS[name] = collect
+
+
+def render() -> str:
+    """
+    Toutes les métriques au format texte Prometheus (version 0.0.4).
+    """
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for collect in list(_COLLECTORS.values()):
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Traces
+# -------------------------
+
+def start_trace() -> contextvars.Token:
+    return _TRACE.set([])
+
+
+def end_trace(token: contextvars.Token) -> List[Event]:
+    events = _TRACE.get() or []
+    _TRACE.reset(token)
+    return events
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, name)
+        trace = _TRACE.get()
+        if trace is not None:
+            trace.append(("span", name, elapsed))
+
+
+def record_solve(solver: Any, status: int) -> None:
+    """
+    Relève les champs de la réponse CP-SAT après un appel à Solve.
+    """
+    if not METRICS_ENABLED:
+        return
+    response = solver.ResponseProto()
+    fields = {
+        "wall_time": response.wall_time,
+        "deterministic_time": response.deterministic_time,
+        "num_branches": response.num_branches,
+        "num_conflicts": response.num_conflicts,
+    }
+    _observe_solve(solver.StatusName(status), fields)
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.append(("solve", solver.StatusName(status), fields))
+
+
+def _observe_solve(status: str, fields: Dict[str, float]) -> None:
+    SOLVES.inc(1, status)
+    SOLVE_SECONDS.observe(fields["wall_time"], status)
+    SOLVE_DETERMINISTIC.observe(fields["deterministic_time"], status)
+    SOLVE_BRANCHES.inc(fields["num_branches"])
+    SOLVE_CONFLICTS.inc(fields["num_conflicts"])
+
+
+def replay(events: List[Event]) -> None:
+    """
+    Intègre les événements renvoyés par un processus du pool : métriques
+    locales et trace de la requête en cours.
+    """
+    if not METRICS_ENABLED:
+        return
+    for kind, name, value in events:
+        if kind == "span":
+            SPAN_SECONDS.observe(value, name)
+        else:
+            _observe_solve(name, value)
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.extend(events)
+
+
+def server_timing(events: List[Event], total: float) -> str:
+    """
+    En-tête Server-Timing : durée cumulée par étape et nombre de résolutions.
+    """
+    spans: Dict[str, float] = {}
+    solves = 0
+    solve_time = 0.0
+    for kind, name, value in events:
+        if kind == "span":
+            spans[name] = spans.get(name, 0.0) + value
+        else:
+            solves += 1
+            solve_time += value["wall_time"]
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in spans.items()]
+    if solves:
+        parts.append(f'cpsat;dur={solve_time * 1000:.3f};desc="{solves} solves"')
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : durée de chaque requête HTTP par route et statut, trace
+    ouverte pendant le traitement et renvoyée dans l'en-tête Server-Timing.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        token = start_trace()
+        status = "500"
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                header = server_timing(_TRACE.get() or [], time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_trace(token)
+            route = scope.get("route")
+            path = getattr(route, "path", "inconnue")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], path, status)
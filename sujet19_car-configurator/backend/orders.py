@@ -0,0 +1,285 @@
+"""
+Validation en masse de commandes (exports du configurateur ou du service
+commandes), en CSV ou en JSONL, avec les mêmes variables que le catalogue.
+
+- CSV : une ligne d'en-tête (noms des variables, plus une colonne `id` ou
+  `order_id` facultative), puis une commande par ligne ; une cellule vide
+  laisse la variable libre. Les autres colonnes sont ignorées.
+- JSONL : un objet par ligne, soit {"id": ..., "model": ..., ...}, soit
+  {"id": ..., "assignments": {...}}.
+
+Les commandes sont lues et validées par paquets de `ORDER_CHUNK_SIZE` : la
+mémoire reste bornée quelle que soit la taille du fichier, et les résultats
+sont écrits au fil de l'eau. Dans un paquet, chaque commande distincte n'est
+vérifiée qu'une fois :
+
+- commande complète avec table compilée : un seul test de bit (indice en base
+  mixte dans le bitset des configurations valides) ;
+- commande complète sans table : une recherche par portée dans les ensembles
+  de combinaisons interdites ;
+- commande partielle : propagation (treillis, table ou solveur, avec cache).
+
+Une commande invalide est réparée vers la configuration complète la plus
+proche, pondérée par les poids du catalogue (voir repair.py).
+
+Usage :
+
+    python orders.py commandes.csv --output resultats.jsonl
+    python orders.py - --format jsonl < commandes.jsonl
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rules import CompiledCatalogue
+from table_engine import ConfigTable
+
+
+# Commandes validées ensemble (lecture, dédoublonnage, réparations)
+ORDER_CHUNK_SIZE = int(os.environ.get("CONFIGURATOR_ORDER_CHUNK", "1000"))
+
+ID_FIELDS = ("id", "order_id")
+FORMATS = ("csv", "jsonl")
+
+# Résultat d'une commande : {"line", "id", "status", ...}
+Order = Dict[str, Any]
+
+
+class OrderReader:
+    """
+    Découpe un flux de lignes en commandes, une ligne à la fois.
+    Les champs CSV contenant un retour à la ligne ne sont pas acceptés.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format inconnu : {fmt}")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.line = 0
+
+    def parse(self, line: str) -> Optional[Order]:
+        """
+        Commande lue sur la ligne, ou None (ligne vide, en-tête CSV). Une
+        ligne illisible donne une commande en erreur.
+        """
+        self.line += 1
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            return None
+        if self.fmt == "csv":
+            row = next(csv.reader([line]))
+            if self.header is None:
+                self.header = [name.strip() for name in row]
+                return None
+            if len(row) != len(self.header):
+                return {"line": self.line, "id": None, "status": "error", "error": "Nombre de colonnes incorrect"}
+            fields: Dict[str, Any] = dict(zip(self.header, row))
+        else:
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                return {"line": self.line, "id": None, "status": "error", "error": "JSON invalide"}
+            if not isinstance(fields, dict):
+                return {"line": self.line, "id": None, "status": "error", "error": "Objet JSON attendu"}
+        order_id = next((fields.pop(name) for name in ID_FIELDS if name in fields), None)
+        if isinstance(fields.get("assignments"), dict):
+            fields = fields["assignments"]
+        return {"line": self.line, "id": order_id, "fields": fields}
+
+
+class OrderStats:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, result: Order) -> None:
+        self.counts[result["status"]] = self.counts.get(result["status"], 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        total = sum(self.counts.values())
+        return {
+            "orders": total,
+            **{status: self.counts.get(status, 0) for status in ("valid", "invalid", "repaired", "rejected", "error")},
+            "seconds": round(elapsed, 3),
+            "orders_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+        }
+
+
+class OrderValidator:
+    def __init__(
+        self,
+        catalogue: CompiledCatalogue,
+        table: Optional[ConfigTable],
+        propagate: Callable[[Dict[str, Optional[str]]], Tuple[Dict[str, List[str]], bool]],
+        repair: Callable[[Dict[str, Optional[str]]], Tuple[Optional[Dict[str, str]], str]],
+    ):
+        self.catalogue = catalogue
+        self.variables = catalogue.variables
+        self.names = list(self.variables)
+        self.table = table
+        self._propagate = propagate
+        self._repair = repair
+        if table is not None:
+            # Bitset des configurations valides en octets : test d'un bit en O(1)
+            self._valid_bytes = table.valid.to_bytes((table.size + 7) // 8, "little")
+        position = {name: k for k, name in enumerate(self.names)}
+        self._forbidden = [([position[name] for name in scope], set(tuples)) for scope, tuples in catalogue.tables]
+
+    def _complete_is_valid(self, indices: List[int]) -> bool:
+        if self.table is not None:
+            k = sum(v * stride for v, stride in zip(indices, self.table.strides))
+            return bool(self._valid_bytes[k >> 3] >> (k & 7) & 1)
+        return all(tuple(indices[p] for p in scope) not in tuples for scope, tuples in self._forbidden)
+
+    def check(self, orders: List[Order]) -> List[Order]:
+        """
+        Statut de chaque commande du paquet : "valid", "invalid" (à réparer,
+        avec ses choix dans `assignments`) ou "error" (valeur inconnue ou
+        qui n'est pas une chaîne). Les commandes identiques ne sont vérifiées qu'une fois.
+        """
+        seen: Dict[Tuple[Tuple[str, str], ...], bool] = {}
+        results = []
+        for order in orders:
+            if "fields" not in order:
+                results.append(order)
+                continue
+            result = {"line": order["line"], "id": order["id"]}
+            assignments: Dict[str, str] = {}
+            unknown = []
+            malformed = []
+            for name, value in order["fields"].items():
+                if name not in self.variables or value in (None, ""):
+                    continue
+                if not isinstance(value, str):
+                    # Liste, objet, nombre... (JSONL) : erreur pour cette commande seulement
+                    malformed.append(name)
+                elif value not in self.catalogue.index[name]:
+                    unknown.append(f"{name}={value}")
+                else:
+                    assignments[name] = value
+            if malformed:
+                results.append({**result, "status": "error", "error": "Valeurs non textuelles : " + ", ".join(malformed)})
+                continue
+            if unknown:
+                results.append({**result, "status": "error", "error": "Choix inconnus : " + ", ".join(unknown)})
+                continue
+            key = tuple(sorted(assignments.items()))
+            is_valid = seen.get(key)
+            if is_valid is None:
+                if len(assignments) == len(self.names):
+                    is_valid = self._complete_is_valid([self.catalogue.index[n][assignments[n]] for n in self.names])
+                else:
+                    is_valid = self._propagate(assignments)[1]
+                seen[key] = is_valid
+            result["complete"] = len(assignments) == len(self.names)
+            if is_valid:
+                results.append({**result, "status": "valid"})
+            else:
+                results.append({**result, "status": "invalid", "assignments": assignments})
+        return results
+
+    def apply_repair(self, result: Order, config: Optional[Dict[str, str]]) -> None:
+        """
+        Remplace le statut "invalid" par "repaired" (configuration la plus
+        proche, choix modifiés et coût pondéré) ou "rejected".
+        """
+        assignments = result.pop("assignments")
+        if config is None:
+            result["status"] = "rejected"
+            return
+        changes = {
+            name: {"from": value, "to": config[name]}
+            for name, value in assignments.items()
+            if config[name] != value
+        }
+        result.update({
+            "status": "repaired",
+            "configuration": config,
+            "changes": changes,
+            "cost": sum(self.catalogue.weights[name] for name in changes),
+        })
+
+    def repair(self, results: List[Order]) -> None:
+        """
+        Répare les commandes invalides du paquet, une résolution par
+        commande distincte.
+        """
+        repaired: Dict[Tuple[Tuple[str, str], ...], Optional[Dict[str, str]]] = {}
+        for result in results:
+            if result["status"] != "invalid":
+                continue
+            key = tuple(sorted(result["assignments"].items()))
+            if key not in repaired:
+                repaired[key] = self._repair(dict(key))[0]
+            self.apply_repair(result, repaired[key])
+
+    def validate(self, lines: Iterable[str], fmt: str, repair: bool = True, stats: Optional[OrderStats] = None) -> Iterator[Order]:
+        """
+        Résultats au fil de l'eau, paquet par paquet. Sans réparation, les
+        commandes invalides restent au statut "invalid".
+        """
+        reader = OrderReader(fmt)
+        chunk: List[Order] = []
+        for line in lines:
+            order = reader.parse(line)
+            if order is not None:
+                chunk.append(order)
+            if len(chunk) >= ORDER_CHUNK_SIZE:
+                yield from self._validate_chunk(chunk, repair, stats)
+                chunk = []
+        if chunk:
+            yield from self._validate_chunk(chunk, repair, stats)
+
+    def _validate_chunk(self, chunk: List[Order], repair: bool, stats: Optional[OrderStats]) -> List[Order]:
+        results = self.check(chunk)
+        if repair:
+            self.repair(results)
+        for result in results:
+            result.pop("assignments", None)
+            if stats is not None:
+                stats.add(result)
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validation en masse de commandes (CSV ou JSONL)")
+    parser.add_argument("input", help="fichier de commandes, ou - pour l'entrée standard")
+    parser.add_argument("--format", choices=FORMATS, help="déduit de l'extension par défaut")
+    parser.add_argument("--output", help="résultats JSONL (sortie standard par défaut)")
+    parser.add_argument("--no-repair", action="store_true", help="signale les commandes invalides sans les réparer")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.input.endswith(".csv") else "jsonl")
+
+    from solver import ORDERS
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    stats = OrderStats()
+    try:
+        for result in ORDERS.validate(source, fmt, repair=not args.no_repair, stats=stats):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    summary = stats.summary()
+    print(
+        f"{summary['orders']} commandes en {summary['seconds']} s ({summary['orders_per_second']} commandes/s) : "
+        f"{summary['valid']} valides, {summary['invalid']} invalides non réparées, {summary['repaired']} réparées, {summary['rejected']} rejetées, "
+        f"{summary['error']} en erreur",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
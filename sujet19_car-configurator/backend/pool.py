@@ -0,0 +1,141 @@
+"""
+Pool borné de processus solveurs pour l'API.
+
+Chaque processus importe `solver` (catalogue compilé, table) au démarrage,
+et OR-Tools si la propagation en a besoin (ni table ni treillis) : il est
+« chaud » quand la première requête arrive. Les
+handlers FastAPI y envoient leurs calculs de façon asynchrone :
+
+- au-delà de `max_pending` requêtes en cours, `PoolSaturated` est levée
+  (l'API répond 429) ;
+- chaque requête a une échéance ; passé ce délai, `asyncio.TimeoutError`
+  est levée (l'API répond 504). Le calcul se termine quand même dans le
+  processus, mais son résultat est ignoré.
+
+Le nombre de threads CP-SAT de chaque processus est réduit à
+cpu_count // workers, au lieu de 8 threads par requête (modifiable via
+CONFIGURATOR_POOL_SEARCH_WORKERS).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+
+POOL_WORKERS = int(os.environ.get("CONFIGURATOR_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+POOL_MAX_PENDING = int(os.environ.get("CONFIGURATOR_POOL_MAX_PENDING", str(POOL_WORKERS * 8)))
+DEFAULT_DEADLINE_SECONDS = float(os.environ.get("CONFIGURATOR_DEADLINE_SECONDS", "5.0"))
+# Threads CP-SAT par processus (0 : cpu_count // workers)
+POOL_SEARCH_WORKERS = int(os.environ.get("CONFIGURATOR_POOL_SEARCH_WORKERS", "0"))
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def _worker_init(search_workers: int) -> None:
+    import cpsat_engine
+    import solver
+
+    solver.NUM_SEARCH_WORKERS = search_workers
+    solver.CATALOGUES.search_workers = search_workers
+    # Sans table ni treillis, chaque propagation passe par CP-SAT : OR-Tools
+    # est chargé d'avance. Sinon l'import reste différé à la première
+    # résolution, et le démarrage n'en paie pas le coût.
+    if solver.propagation_needs_solver():
+        cpsat_engine.load_ortools()
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _worker_compute(kind: str, *args: Any) -> Any:
+    import solver
+
+    if kind == "propagate":
+        return solver.propagate_domains(*args)
+    if kind == "solve":
+        return solver.solve_configuration(*args)
+    if kind == "repair":
+        return solver.repair_configuration(*args)
+    if kind == "explain":
+        return solver.explain_conflict(*args)
+    if kind == "catalogue_propagate":
+        return solver.propagate_catalogue(*args)
+    if kind == "propagate_batch":
+        return [solver.propagate_domains(item) for item in args[0]]
+    raise ValueError(f"Calcul inconnu : {kind}")
+
+
+def _worker_run(kind: str, *args: Any) -> Tuple[Any, List[metrics.Event]]:
+    """
+    Résultat du calcul et événements de mesure (étapes, résolutions CP-SAT),
+    rejoués dans le processus principal.
+    """
+    token = metrics.start_trace()
+    try:
+        result = _worker_compute(kind, *args)
+    finally:
+        events = metrics.end_trace(token)
+    return result, events
+
+
+class SolverPool:
+    def __init__(self, workers: int = POOL_WORKERS, max_pending: int = POOL_MAX_PENDING, search_workers: Optional[int] = None):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        if search_workers is None:
+            search_workers = POOL_SEARCH_WORKERS
+        self.search_workers = search_workers or max(1, (os.cpu_count() or 1) // self.workers)
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_worker_init,
+            initargs=(self.search_workers,),
+        )
+
+    async def warm_up(self) -> None:
+        """
+        Démarre tous les processus et attend qu'ils aient chargé le solveur.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.workers)))
+
+    async def run(self, kind: str, *args: Any, deadline: Optional[float] = None) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolSaturated()
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, _worker_run, kind, *args)
+            result, events = await asyncio.wait_for(future, deadline or DEFAULT_DEADLINE_SECONDS)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        metrics.replay(events)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "search_workers_per_process": self.search_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,147 @@
+"""
+État d'une connexion WebSocket du configurateur (route /ws de main.py).
+
+Le client envoie ses changements :
+
+- {"type": "set", "variable": v, "value": x, "seq": n} : un seul choix
+  (valeur vide ou null : retire le choix) ;
+- {"type": "assign", "assignments": {...}, "seq": n} : remplace tous les choix
+  (remise à zéro, preset, ou formulaire complet).
+
+Le serveur répond d'abord par l'état complet, puis par des différences par
+rapport au dernier message envoyé :
+
+- {"type": "state", "seq", "assignments", "domains", "valid", "counts"} ;
+- {"type": "diff", "seq", "assignments", "valid", "added": {var: [valeurs]},
+  "removed": {var: [valeurs]}, "counts": {var: {valeur: n}}}, où `counts` ne
+  contient que les compteurs modifiés ;
+- {"type": "error", "detail"} pour un message illisible (JSON invalide) ou mal
+  formé, qui est ignoré : la connexion reste ouverte ; {"type": "error",
+  "seq", "detail"} si la propagation échoue (solveur saturé, délai dépassé).
+
+`seq` est le numéro du dernier changement pris en compte. Les changements
+reçus pendant un calcul le rendent obsolète : il est annulé et seul l'état le
+plus récent est propagé. Le client doit appliquer les différences dans l'ordre.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+
+# Délai laissé à une rafale de changements avant de lancer la propagation
+COALESCE_SECONDS = 0.01
+
+# Compteurs globaux, exportés sur /metrics
+_STATS = {"connections": 0, "changes": 0, "pushes": 0, "coalesced": 0, "cancelled": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def count(event: str, amount: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[event] += amount
+
+
+def stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+class LiveConfiguration:
+    def __init__(self, variables: Dict[str, List[str]]):
+        self.variables = variables
+        self.assignments: Dict[str, str] = {}
+        self.seq = 0
+        # Changements reçus depuis la dernière propagation
+        self.pending = 0
+        # Dernier état envoyé au client (None avant le premier message)
+        self.domains: Optional[Dict[str, List[str]]] = None
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.valid: Optional[bool] = None
+
+    def _check(self, name: Any, value: Any) -> None:
+        if name not in self.variables:
+            raise ValueError(f"Variable inconnue : {name}")
+        if value not in (None, "") and value not in self.variables[name]:
+            raise ValueError(f"Choix inconnu : {name}={value}")
+
+    def apply(self, message: Dict[str, Any]) -> None:
+        """
+        Applique un message du client. Lève ValueError s'il est mal formé.
+        """
+        if not isinstance(message, dict):
+            raise ValueError("Message mal formé")
+        kind = message.get("type")
+        if kind == "set":
+            name, value = message.get("variable"), message.get("value")
+            self._check(name, value)
+            if value in (None, ""):
+                self.assignments.pop(name, None)
+            else:
+                self.assignments[name] = value
+        elif kind == "assign":
+            assignments = message.get("assignments")
+            if not isinstance(assignments, dict):
+                raise ValueError("'assignments' doit être un objet")
+            for name, value in assignments.items():
+                self._check(name, value)
+            self.assignments = {name: value for name, value in assignments.items() if value not in (None, "")}
+        else:
+            raise ValueError(f"Type de message inconnu : {kind}")
+        seq = message.get("seq")
+        self.seq = seq if isinstance(seq, int) else self.seq + 1
+        self.pending += 1
+        count("changes")
+
+    def push(
+        self,
+        seq: int,
+        assignments: Dict[str, str],
+        domains: Dict[str, List[str]],
+        valid: bool,
+        counts: Optional[Dict[str, Dict[str, int]]],
+    ) -> Dict[str, Any]:
+        """
+        Message à envoyer pour le résultat d'une propagation : l'état complet
+        la première fois, puis uniquement ce qui a changé.
+        """
+        counts = counts or {}
+        if self.domains is None:
+            message: Dict[str, Any] = {
+                "type": "state",
+                "seq": seq,
+                "assignments": assignments,
+                "domains": domains,
+                "valid": valid,
+                "counts": counts or None,
+            }
+        else:
+            added: Dict[str, List[str]] = {}
+            removed: Dict[str, List[str]] = {}
+            changed_counts: Dict[str, Dict[str, int]] = {}
+            for name in self.variables:
+                before, after = self.domains.get(name, []), domains.get(name, [])
+                before_set, after_set = set(before), set(after)
+                new_values = [value for value in after if value not in before_set]
+                if new_values:
+                    added[name] = new_values
+                gone = [value for value in before if value not in after_set]
+                if gone:
+                    removed[name] = gone
+                previous = self.counts.get(name, {})
+                changed = {value: n for value, n in counts.get(name, {}).items() if previous.get(value) != n}
+                if changed:
+                    changed_counts[name] = changed
+            message = {
+                "type": "diff",
+                "seq": seq,
+                "assignments": assignments,
+                "valid": valid,
+                "added": added,
+                "removed": removed,
+                "counts": changed_counts,
+            }
+        self.domains = domains
+        self.counts = counts
+        self.valid = valid
+        count("pushes")
+        return message
@@ -0,0 +1,101 @@
+"""
+Réparation de choix incohérents : configuration valide la plus proche.
+
+Quand l'utilisateur choisit une option incompatible avec ses choix
+précédents (ex. electric_lr après compact), on cherche la configuration
+complète valide qui modifie le moins de choix possible, chaque choix
+modifié coûtant son poids. Par défaut ce poids est celui du catalogue
+(`weights`) ; avec l'historique des choix, il est multiplié par le rang du
+choix (1 pour le plus ancien) : un choix récent est plus coûteux à modifier
+qu'un choix ancien.
+
+Avec la table compilée, la recherche est exacte : séparation et évaluation
+sur les choix, du plus lourd au plus léger, en gardant un choix tant que le
+bitset des configurations compatibles reste non vide (un ET binaire par
+nœud), et en élaguant dès que le poids gardé ne peut plus dépasser la
+meilleure solution. Sans table, CP-SAT minimise la distance de Hamming
+pondérée (objectif « closest »).
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cpsat_engine
+from rules import CompiledCatalogue
+from table_engine import ConfigTable
+
+
+def recency_weights(
+    catalogue: CompiledCatalogue, chosen: Dict[str, int], history: Optional[Sequence[str]] = None
+) -> Dict[str, int]:
+    """
+    Poids de modification de chaque choix. `history` liste les variables dans
+    l'ordre où elles ont été choisies (la plus ancienne d'abord) ; les choix
+    absents de l'historique sont considérés comme les plus anciens.
+    """
+    if history is None:
+        return {name: catalogue.weights[name] for name in chosen}
+    ordered = [name for name in chosen if name not in history]
+    ordered += [name for name in dict.fromkeys(history) if name in chosen]
+    return {name: catalogue.weights[name] * (rank + 1) for rank, name in enumerate(ordered)}
+
+
+class ConfigurationRepairer:
+    def __init__(self, catalogue: CompiledCatalogue, table: Optional[ConfigTable], search_workers: int = 1, time_limit: float = 1.0):
+        self.catalogue = catalogue
+        self.table = table
+        self.search_workers = search_workers
+        self.time_limit = time_limit
+        self.position = {name: k for k, name in enumerate(catalogue.variables)}
+
+    def repair(
+        self,
+        chosen: Dict[str, int],
+        weights: Dict[str, int],
+        search_workers: Optional[int] = None,
+    ) -> Tuple[Optional[Dict[str, str]], str]:
+        """
+        Configuration complète valide de coût minimal (somme des poids des
+        choix modifiés), et statut ("OPTIMAL", "FEASIBLE" si CP-SAT s'est
+        arrêté avant la preuve d'optimalité, "UNKNOWN" s'il n'a rien trouvé
+        dans le temps imparti, ou "INFEASIBLE").
+        `search_workers` remplace le nombre de threads CP-SAT du constructeur.
+        """
+        if self.table is not None:
+            return self._repair_table(chosen, weights)
+        config, status = cpsat_engine.optimize(
+            self.catalogue, {}, "closest", chosen, chosen, search_workers or self.search_workers, self.time_limit, weights
+        )
+        return config, status
+
+    def _repair_table(self, chosen: Dict[str, int], weights: Dict[str, int]) -> Tuple[Optional[Dict[str, str]], str]:
+        table = self.table
+        if not table.valid:
+            return None, "INFEASIBLE"
+        # Choix du plus lourd au plus léger : les bonnes solutions arrivent tôt
+        items: List[Tuple[int, int]] = sorted(
+            ((weights[name], table.value_masks[self.position[name]][v]) for name, v in chosen.items()),
+            key=lambda item: -item[0],
+        )
+        # remaining[i] : poids total des choix i, i+1, ...
+        remaining = [0] * (len(items) + 1)
+        for i in range(len(items) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + items[i][0]
+
+        best_kept = -1
+        best_mask = 0
+
+        def search(i: int, mask: int, kept: int) -> None:
+            nonlocal best_kept, best_mask
+            if kept + remaining[i] <= best_kept:
+                return
+            if i == len(items):
+                best_kept, best_mask = kept, mask
+                return
+            weight, value_mask = items[i]
+            narrowed = mask & value_mask
+            if narrowed:
+                search(i + 1, narrowed, kept + weight)
+            search(i + 1, mask, kept)
+
+        search(0, table.valid, 0)
+        return table.decode((best_mask & -best_mask).bit_length() - 1), "OPTIMAL"
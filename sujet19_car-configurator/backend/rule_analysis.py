@@ -0,0 +1,281 @@
+"""
+Analyse statique des règles d'un catalogue, à lancer avant un déploiement.
+
+Le rapport signale :
+
+- les combinaisons interdites en double (même combinaison dans plusieurs règles) ;
+- les combinaisons subsumées, déjà interdites par une combinaison plus
+  générale (ex. compact+awd+manual quand compact+awd est interdit) ;
+- les valeurs mortes, qui n'apparaissent dans aucune configuration valide ;
+- les règles impliquées par les autres (les retirer ne change rien).
+
+Il produit aussi un jeu de règles minimisé, équivalent à l'original : les
+doublons et les combinaisons redondantes sont retirés (en gardant la première
+occurrence), les règles vides disparaissent. Le test de redondance utilise la
+table compilée quand le catalogue est assez petit, sinon CP-SAT avec un
+littéral d'activation par combinaison (un seul modèle, testé par hypothèses).
+
+Usage :
+
+    python rule_analysis.py                          # catalogue.json, rapport lisible
+    python rule_analysis.py autre.json --minimized min.json --report rapport.json
+    python rule_analysis.py --strict                 # code de sortie 1 si un problème est trouvé
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from ortools.sat.python import cp_model
+
+import cpsat_engine
+from gac import GacPropagator
+from rules import CompiledCatalogue, compile_catalogue
+from table_engine import ConfigTable
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Combinaison interdite normalisée : (portée, indices des valeurs)
+Combo = Tuple[Tuple[str, ...], Tuple[int, ...]]
+
+
+class RuleAnalyzer:
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.catalogue: CompiledCatalogue = compile_catalogue(data)
+        self.variables = self.catalogue.variables
+        self.position = {name: k for k, name in enumerate(self.variables)}
+        self.table = ConfigTable.from_catalogue(self.catalogue)
+
+        # Combinaisons distinctes, dans l'ordre du fichier, et règles qui les contiennent
+        self.combos: List[Combo] = []
+        self.owners: Dict[Combo, List[int]] = {}
+        for r, (_, rule_combos) in enumerate(self.catalogue.rules):
+            for combo in rule_combos:
+                if combo not in self.owners:
+                    self.owners[combo] = []
+                    self.combos.append(combo)
+                self.owners[combo].append(r)
+
+        if self.table is not None:
+            self._masks = [self.table.tuples_mask([self.position[n] for n in scope], [values]) for scope, values in self.combos]
+        else:
+            self._build_cpsat()
+
+    # -------------------------
+    # Test de redondance
+    # -------------------------
+
+    def _build_cpsat(self) -> None:
+        model = cp_model.CpModel()
+        vars_int = {name: model.NewIntVar(0, len(values) - 1, name) for name, values in self.variables.items()}
+        equals: Dict[Tuple[str, int], Any] = {}
+        for scope, values in self.combos:
+            for name, v in zip(scope, values):
+                if (name, v) not in equals:
+                    lit = model.NewBoolVar(f"{name}=={v}")
+                    model.Add(vars_int[name] == v).OnlyEnforceIf(lit)
+                    model.Add(vars_int[name] != v).OnlyEnforceIf(lit.Not())
+                    equals[(name, v)] = lit
+        # Combinaison i active => elle est interdite
+        self._enabled = []
+        for i, (scope, values) in enumerate(self.combos):
+            enabled = model.NewBoolVar(f"combo_{i}")
+            model.AddBoolOr([equals[(n, v)].Not() for n, v in zip(scope, values)] + [enabled.Not()])
+            self._enabled.append(enabled)
+        self._equals = equals
+        self._model = model
+
+    def _covered(self, i: int, others: Sequence[int]) -> bool:
+        """
+        Vrai si toute configuration contenant la combinaison i est déjà
+        interdite par l'une des combinaisons `others`.
+        """
+        if self.table is not None:
+            union = 0
+            for j in others:
+                union |= self._masks[j]
+            return self._masks[i] & ~union == 0
+        scope, values = self.combos[i]
+        self._model.ClearAssumptions()
+        self._model.AddAssumptions(
+            [self._enabled[j] for j in others] + [self._equals[(n, v)] for n, v in zip(scope, values)]
+        )
+        solver = cp_model.CpSolver()
+        solver.parameters.num_search_workers = 1
+        return cpsat_engine.solve(solver, self._model) == cp_model.INFEASIBLE
+
+    # -------------------------
+    # Analyses
+    # -------------------------
+
+    def _combo_dict(self, combo: Combo) -> Dict[str, str]:
+        scope, values = combo
+        return {name: self.variables[name][v] for name, v in zip(scope, values)}
+
+    def _rule_name(self, r: int) -> str:
+        return self.catalogue.rules[r][0]
+
+    def duplicates(self) -> List[Dict[str, Any]]:
+        return [
+            {"combination": self._combo_dict(combo), "rules": [self._rule_name(r) for r in self.owners[combo]]}
+            for combo in self.combos
+            if len(self.owners[combo]) > 1
+        ]
+
+    def subsumed(self) -> List[Dict[str, Any]]:
+        out = []
+        for combo in self.combos:
+            scope, values = combo
+            assigned = dict(zip(scope, values))
+            for general in self.combos:
+                g_scope, g_values = general
+                if len(g_scope) < len(scope) and all(assigned.get(n) == v for n, v in zip(g_scope, g_values)):
+                    out.append({
+                        "combination": self._combo_dict(combo),
+                        "by": self._combo_dict(general),
+                        "rules": [self._rule_name(r) for r in self.owners[combo]],
+                    })
+                    break
+        return out
+
+    def dead_values(self) -> Dict[str, List[str]]:
+        if self.table is not None:
+            domains, _ = self.table.domains_from_mask(self.table.valid)
+        else:
+            domains, _, complete = GacPropagator(self.variables, self.catalogue.tables).propagate({})
+            if not complete:
+                # Valeurs non prouvées impossibles (limite de temps) : gardées, donc pas signalées
+                domains, _, _ = cpsat_engine.propagate(self.catalogue, {}, 1, time_limit=10.0)
+        return {
+            name: [value for value in values if value not in domains[name]]
+            for name, values in self.variables.items()
+            if len(domains[name]) < len(values)
+        }
+
+    def implied_rules(self) -> List[str]:
+        implied = []
+        for r, (description, rule_combos) in enumerate(self.catalogue.rules):
+            if not rule_combos:
+                continue
+            others = [j for j, combo in enumerate(self.combos) if any(o != r for o in self.owners[combo])]
+            mine = [self.combos.index(combo) for combo in rule_combos]
+            if all(i in others or self._covered(i, others) for i in mine):
+                implied.append(description)
+        return implied
+
+    def minimize(self) -> Tuple[Set[int], List[Dict[str, Any]]]:
+        """
+        Indices des combinaisons gardées et combinaisons retirées. On essaie
+        de retirer d'abord les plus spécifiques (portée la plus longue), puis
+        celles des dernières règles.
+        """
+        kept = set(range(len(self.combos)))
+        order = sorted(kept, key=lambda i: (-len(self.combos[i][0]), -self.owners[self.combos[i]][0]))
+        removed = []
+        for i in order:
+            others = [j for j in kept if j != i]
+            if self._covered(i, others):
+                kept.discard(i)
+                removed.append({
+                    "combination": self._combo_dict(self.combos[i]),
+                    "rules": [self._rule_name(r) for r in self.owners[self.combos[i]]],
+                })
+        return kept, removed
+
+    def minimized_catalogue(self, kept: Set[int]) -> Dict[str, Any]:
+        """
+        Catalogue au format de catalogue.json : chaque combinaison gardée reste
+        dans la première règle qui la contient ; une règle `requires` intacte
+        est conservée telle quelle.
+        """
+        index = {combo: i for i, combo in enumerate(self.combos)}
+        rules = []
+        for r, (rule, (description, rule_combos)) in enumerate(zip(self.data.get("rules", []), self.catalogue.rules)):
+            mine = [combo for combo in rule_combos if index[combo] in kept and self.owners[combo][0] == r]
+            if not mine:
+                continue
+            if len(mine) == len(rule_combos) and "forbidden" not in rule:
+                rules.append(rule)
+            else:
+                rules.append({"description": description, "forbidden": [self._combo_dict(c) for c in mine]})
+        return {**self.data, "rules": rules}
+
+    def report(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        kept, removed = self.minimize()
+        minimized = self.minimized_catalogue(kept)
+        equivalent: Optional[bool] = None
+        if self.table is not None:
+            equivalent = ConfigTable.from_catalogue(compile_catalogue(minimized)).valid == self.table.valid
+        report = {
+            "rules": len(self.catalogue.rules),
+            "combinations_written": self.catalogue.raw_tuple_count,
+            "combinations_distinct": len(self.combos),
+            "duplicates": self.duplicates(),
+            "subsumed": self.subsumed(),
+            "dead_values": self.dead_values(),
+            "implied_rules": self.implied_rules(),
+            "redundant": removed,
+            "minimized": {"rules": len(minimized["rules"]), "combinations": len(kept), "equivalent": equivalent},
+        }
+        return report, minimized
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    def combo(c: Dict[str, str]) -> str:
+        return " + ".join(f"{n}={v}" for n, v in c.items())
+
+    print(f"{report['rules']} règles, {report['combinations_written']} combinaisons écrites, "
+          f"{report['combinations_distinct']} distinctes")
+    print(f"\nDoublons ({len(report['duplicates'])}) :")
+    for d in report["duplicates"]:
+        print(f"  - {combo(d['combination'])} : " + " | ".join(d["rules"]))
+    print(f"\nCombinaisons subsumées ({len(report['subsumed'])}) :")
+    for s in report["subsumed"]:
+        print(f"  - {combo(s['combination'])} déjà interdite par {combo(s['by'])}")
+    dead = report["dead_values"]
+    print(f"\nValeurs mortes ({sum(len(v) for v in dead.values())}) :")
+    for name, values in dead.items():
+        print(f"  - {name} : {', '.join(values)}")
+    print(f"\nRègles impliquées par les autres ({len(report['implied_rules'])}) :")
+    for description in report["implied_rules"]:
+        print(f"  - {description}")
+    print(f"\nCombinaisons redondantes retirées ({len(report['redundant'])}) :")
+    for r in report["redundant"]:
+        print(f"  - {combo(r['combination'])}")
+    m = report["minimized"]
+    equivalent = {True: "oui", False: "NON", None: "non vérifié"}[m["equivalent"]]
+    print(f"\nJeu minimisé : {m['rules']} règles, {m['combinations']} combinaisons (équivalent : {equivalent})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyse statique des règles d'un catalogue")
+    parser.add_argument("catalogue", nargs="?", default=os.path.join(BASE_DIR, "catalogue.json"))
+    parser.add_argument("--minimized", help="écrit le catalogue minimisé dans ce fichier")
+    parser.add_argument("--report", help="écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--strict", action="store_true", help="code de sortie 1 en cas de doublon, valeur morte ou règle impliquée")
+    args = parser.parse_args()
+
+    with open(args.catalogue, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    report, minimized = RuleAnalyzer(data).report()
+    _print_report(report)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.minimized:
+        with open(args.minimized, "w", encoding="utf-8") as f:
+            json.dump(minimized, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    problems = report["duplicates"] or report["dead_values"] or report["implied_rules"] or report["minimized"]["equivalent"] is False
+    if args.strict and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Chargement et compilation du catalogue déclaratif (catalogue.json).
+
+Le fichier décrit les variables, leurs libellés et les règles métier :
+
+- `forbidden` : liste de combinaisons interdites, ex. {"model": "compact", "drivetrain": "awd"} ;
+- `requires` : {"if": {...}, "then": {var: [valeurs autorisées]}}, traduit en
+  combinaisons interdites pour toutes les autres valeurs de `var`.
+
+Deux sections facultatives servent aux objectifs de `/solve` :
+
+- `prices` : prix (entier, en euros) de chaque valeur, 0 par défaut ;
+- `weights` : poids d'un changement de chaque variable pour l'objectif
+  « closest » (distance à une configuration de référence), 1 par défaut.
+
+La compilation normalise chaque combinaison (variables dans l'ordre du
+catalogue), supprime les doublons et regroupe toutes les combinaisons d'une
+même portée en une seule table interdite. Le résultat est mis en cache par
+empreinte du fichier.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+# (portée : noms de variables dans l'ordre du catalogue, tuples d'indices interdits)
+ForbiddenTable = Tuple[Tuple[str, ...], List[Tuple[int, ...]]]
+
+# (description d'une règle, combinaisons interdites normalisées : (portée, tuple))
+RuleTuples = Tuple[str, List[Tuple[Tuple[str, ...], Tuple[int, ...]]]]
+
+
+class CompiledCatalogue:
+    def __init__(
+        self,
+        variables: Dict[str, List[str]],
+        labels: Dict[str, Dict[str, str]],
+        tables: List[ForbiddenTable],
+        source_hash: str,
+        raw_tuple_count: int,
+        prices: Optional[Dict[str, Dict[str, int]]] = None,
+        weights: Optional[Dict[str, int]] = None,
+        rules: Optional[List[RuleTuples]] = None,
+    ):
+        self.variables = variables
+        self.labels = labels
+        prices = prices or {}
+        weights = weights or {}
+        self.prices = {name: {v: prices.get(name, {}).get(v, 0) for v in values} for name, values in variables.items()}
+        self.weights = {name: weights.get(name, 1) for name in variables}
+        self.index = {name: {v: i for i, v in enumerate(values)} for name, values in variables.items()}
+        self.tables = tables
+        # Provenance : combinaisons interdites par chaque règle du fichier
+        self.rules = rules or []
+        self.source_hash = source_hash
+        # Nombre de combinaisons écrites dans le fichier, avant dédoublonnage
+        self.raw_tuple_count = raw_tuple_count
+        # Empreinte des seules contraintes (variables et tables) : deux versions
+        # d'un catalogue qui ne diffèrent que par les prix ou libellés la partagent
+        self.tables_hash = hashlib.sha256(
+            json.dumps(
+                {"variables": variables, "tables": [[list(scope), tuples] for scope, tuples in tables]},
+                sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()
+        self.rules_hash = hashlib.sha256(
+            json.dumps(
+                {
+                    "variables": variables,
+                    "tables": [[list(scope), tuples] for scope, tuples in tables],
+                    "prices": self.prices,
+                    "weights": self.weights,
+                },
+                sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()
+
+    @property
+    def tuple_count(self) -> int:
+        return sum(len(tuples) for _, tuples in self.tables)
+
+
+def _check_assignment(variables: Dict[str, List[str]], assignment: Dict[str, Any], where: str) -> None:
+    if not isinstance(assignment, dict) or not assignment:
+        raise ValueError(f"{where} : combinaison vide ou mal formée")
+    for name, value in assignment.items():
+        if name not in variables:
+            raise ValueError(f"{where} : variable inconnue '{name}'")
+        if value not in variables[name]:
+            raise ValueError(f"{where} : valeur inconnue '{value}' pour '{name}'")
+
+
+def _expand_rule(variables: Dict[str, List[str]], rule: Dict[str, Any], where: str) -> List[Dict[str, str]]:
+    """
+    Liste des combinaisons interdites exprimées par une règle.
+    """
+    combos: List[Dict[str, str]] = []
+    for combo in rule.get("forbidden", []):
+        _check_assignment(variables, combo, where)
+        combos.append(dict(combo))
+
+    requires = rule.get("requires")
+    if requires is not None:
+        condition = requires.get("if", {})
+        _check_assignment(variables, condition, where)
+        for name, allowed in requires.get("then", {}).items():
+            if name in condition:
+                raise ValueError(f"{where} : '{name}' apparaît dans 'if' et dans 'then'")
+            if name not in variables:
+                raise ValueError(f"{where} : variable inconnue '{name}'")
+            for value in allowed:
+                if value not in variables[name]:
+                    raise ValueError(f"{where} : valeur inconnue '{value}' pour '{name}'")
+            for value in variables[name]:
+                if value not in allowed:
+                    combos.append({**condition, name: value})
+
+    if "forbidden" not in rule and requires is None:
+        raise ValueError(f"{where} : règle sans 'forbidden' ni 'requires'")
+    return combos
+
+
+def compile_catalogue(data: Dict[str, Any], source_hash: str = "") -> CompiledCatalogue:
+    variables: Dict[str, List[str]] = {name: list(values) for name, values in data["variables"].items()}
+    for name, values in variables.items():
+        if not values or len(set(values)) != len(values):
+            raise ValueError(f"Domaine vide ou avec doublons pour '{name}'")
+    labels = data.get("labels", {})
+    position = {name: k for k, name in enumerate(variables)}
+
+    merged: Dict[Tuple[str, ...], Set[Tuple[int, ...]]] = {}
+    rules: List[RuleTuples] = []
+    raw_tuple_count = 0
+    for k, rule in enumerate(data.get("rules", [])):
+        description = rule.get("description", f"Règle {k}")
+        where = f"Règle {k} ({description})"
+        rule_tuples = []
+        for combo in _expand_rule(variables, rule, where):
+            raw_tuple_count += 1
+            scope = tuple(sorted(combo, key=position.__getitem__))
+            values = tuple(variables[name].index(combo[name]) for name in scope)
+            merged.setdefault(scope, set()).add(values)
+            if (scope, values) not in rule_tuples:
+                rule_tuples.append((scope, values))
+        rules.append((description, rule_tuples))
+
+    tables: List[ForbiddenTable] = [
+        (scope, sorted(merged[scope]))
+        for scope in sorted(merged, key=lambda s: (len(s), [position[n] for n in s]))
+    ]
+    prices = data.get("prices", {})
+    for name, value_prices in prices.items():
+        for value, price in value_prices.items():
+            _check_assignment(variables, {name: value}, "prices")
+            if not isinstance(price, int) or price < 0:
+                raise ValueError(f"prices : prix invalide pour {name}={value}")
+    weights = data.get("weights", {})
+    for name, weight in weights.items():
+        if name not in variables:
+            raise ValueError(f"weights : variable inconnue '{name}'")
+        if not isinstance(weight, int) or weight < 0:
+            raise ValueError(f"weights : poids invalide pour '{name}'")
+
+    return CompiledCatalogue(variables, labels, tables, source_hash, raw_tuple_count, prices, weights, rules)
+
+
+_COMPILED: Dict[str, CompiledCatalogue] = {}
+_COMPILED_LOCK = threading.Lock()
+
+
+def load_catalogue(path: str) -> CompiledCatalogue:
+    """
+    Charge et compile un fichier catalogue ; la compilation est mise en cache
+    par empreinte du contenu (un fichier inchangé n'est compilé qu'une fois).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).hexdigest()
+    with _COMPILED_LOCK:
+        compiled: Optional[CompiledCatalogue] = _COMPILED.get(source_hash)
+    if compiled is None:
+        compiled = compile_catalogue(json.loads(raw.decode("utf-8")), source_hash)
+        with _COMPILED_LOCK:
+            _COMPILED[source_hash] = compiled
+    return compiled
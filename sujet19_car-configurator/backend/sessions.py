@@ -0,0 +1,166 @@
+"""
+Sessions de configuration avec propagation incrémentale.
+
+Une session garde les choix de l'utilisateur dans l'ordre où ils ont été
+faits, ainsi qu'une pile (« trail ») des bitsets de configurations valides
+après chaque choix. Ajouter un choix coûte un ET binaire ; retirer un choix
+dépile jusqu'à lui puis réapplique les choix suivants, sans repartir de
+toutes les règles.
+
+Sans table compilée, la session garde seulement les choix et délègue la
+propagation à `propagate` (résultat mis en cache par le solveur).
+
+Les sessions inactives depuis plus de `ttl_seconds` sont supprimées, et
+les plus anciennes le sont aussi au-delà de `max_sessions`.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from table_engine import ConfigTable
+
+
+SESSION_TTL_SECONDS = 1800.0
+SESSION_MAX = 10_000
+
+
+class Session:
+    __slots__ = ("id", "choices", "trail", "touched")
+
+    def __init__(self, session_id: str, base_mask: Optional[int]):
+        self.id = session_id
+        # Choix dans l'ordre d'arrivée : variable -> indice de valeur
+        self.choices: Dict[str, int] = {}
+        # trail[k] : bitset après les k premiers choix (vide sans table)
+        self.trail: List[int] = [base_mask] if base_mask is not None else []
+        self.touched = time.monotonic()
+
+
+class SessionStore:
+    def __init__(
+        self,
+        variables: Dict[str, List[str]],
+        table: Optional[ConfigTable],
+        propagate: Callable[[Dict[str, Optional[str]]], Tuple[Dict[str, List[str]], bool]],
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX,
+    ):
+        self.variables = variables
+        self.index = {name: {v: i for i, v in enumerate(values)} for name, values in variables.items()}
+        self.position = {name: k for k, name in enumerate(variables)}
+        self.table = table
+        self._propagate = propagate
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.touched < self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[oldest.id]
+            self.expired += 1
+
+    def _get(self, session_id: str) -> Session:
+        now = time.monotonic()
+        self._evict(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        session.touched = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _apply(self, session: Session, name: str, idx: int) -> None:
+        session.choices[name] = idx
+        if self.table is not None:
+            mask = session.trail[-1] & self.table.value_masks[self.position[name]][idx]
+            session.trail.append(mask)
+
+    def _remove(self, session: Session, name: str) -> None:
+        names = list(session.choices)
+        k = names.index(name)
+        later = [(n, session.choices[n]) for n in names[k + 1:]]
+        for n in names[k:]:
+            del session.choices[n]
+        if self.table is not None:
+            del session.trail[k + 1:]
+        for n, idx in later:
+            self._apply(session, n, idx)
+
+    def _snapshot(self, session: Session) -> Tuple[str, Dict[str, str], Optional[int]]:
+        assignments = {name: self.variables[name][idx] for name, idx in session.choices.items()}
+        return session.id, assignments, session.trail[-1] if session.trail else None
+
+    def _render(self, snapshot: Tuple[str, Dict[str, str], Optional[int]]) -> Dict[str, Any]:
+        # Hors verrou : sans table, la propagation peut lancer un solveur
+        session_id, assignments, mask = snapshot
+        if mask is not None:
+            domains, is_consistent = self.table.domains_from_mask(mask)
+        else:
+            domains, is_consistent = self._propagate(assignments)
+        return {"session_id": session_id, "assignments": assignments, "domains": domains, "valid": is_consistent}
+
+    # -------------------------
+    # API
+    # -------------------------
+
+    def create(self) -> Dict[str, Any]:
+        session = Session(secrets.token_urlsafe(12), self.table.valid if self.table is not None else None)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict(session.touched)
+            snapshot = self._snapshot(session)
+        return self._render(snapshot)
+
+    def state(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self._snapshot(self._get(session_id))
+        return self._render(snapshot)
+
+    def set(self, session_id: str, name: str, value: Optional[str]) -> Dict[str, Any]:
+        """
+        Fixe `name` à `value` (une valeur vide revient à retirer le choix).
+        Lève KeyError si la session n'existe pas, ValueError si le choix est inconnu.
+        """
+        if value is None or value == "":
+            return self.unset(session_id, name)
+        if name not in self.index or value not in self.index[name]:
+            raise ValueError(f"Choix inconnu : {name}={value}")
+        with self._lock:
+            session = self._get(session_id)
+            if session.choices.get(name) != self.index[name][value]:
+                if name in session.choices:
+                    self._remove(session, name)
+                self._apply(session, name, self.index[name][value])
+            snapshot = self._snapshot(session)
+        return self._render(snapshot)
+
+    def unset(self, session_id: str, name: str) -> Dict[str, Any]:
+        if name not in self.index:
+            raise ValueError(f"Variable inconnue : {name}")
+        with self._lock:
+            session = self._get(session_id)
+            if name in session.choices:
+                self._remove(session, name)
+            snapshot = self._snapshot(session)
+        return self._render(snapshot)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "expired": self.expired,
+            }
@@ -1,65 +1,49 @@
-from typing import Dict, List, Tuple, Optional, Set
-from ortools.sat.python import cp_model
-
+import os
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+
+import compiled_cache
+import cpsat_engine
+import metrics
+from cache import ResultCache
+from catalogues import CatalogueRegistry, propagate_without_table
+from explain import ConflictExplainer
+from gac import GacPropagator
+from implications import ImplicationMatrix
+from lattice import Lattice
+from orders import OrderValidator
+from repair import ConfigurationRepairer, recency_weights
+from rules import CompiledCatalogue, load_catalogue
+from sessions import SessionStore
+from table_engine import ConfigTable
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Threads CP-SAT par résolution. Réduit par pool.py quand plusieurs processus
+# solveurs tournent en parallèle, pour ne pas surcharger les coeurs.
+NUM_SEARCH_WORKERS = int(os.environ.get("CONFIGURATOR_SEARCH_WORKERS", "8"))
 
 # -----------------------
 # Définition du domaine
 # -----------------------
 
-VARIABLES = {
-    "model": ["compact", "suv", "sport_gt", "luxury_sedan"],
-    "engine": ["petrol_1_6", "petrol_2_0t", "diesel_2_0", "hybrid_2_0", "electric_lr"],
-    "transmission": ["manual", "auto8"],
-    "drivetrain": ["fwd", "rwd", "awd"],
-    "color": ["white", "black", "red", "blue", "silver"],
-    "interior": ["cloth", "leather", "alcantara"],
-    "pack": ["none", "tech", "premium", "offroad", "performance"],
-}
+# Variables, libellés et règles métier sont décrits dans catalogue.json
+# (voir rules.py pour le format et la compilation).
+CATALOGUE_PATH = os.environ.get("CONFIGURATOR_CATALOGUE", os.path.join(BASE_DIR, "catalogue.json"))
+
+# Structures compilées lors d'un démarrage précédent (voir compiled_cache.py),
+# ou None : tout est alors compilé ci-dessous, puis écrit pour la fois suivante.
+COMPILED_CACHE_PATH = os.environ.get("CONFIGURATOR_COMPILED_CACHE", os.path.join(BASE_DIR, "compiled.cache"))
+_SOURCE_HASH = compiled_cache.catalogue_hash(CATALOGUE_PATH)
+with metrics.span("startup_cache_load"):
+    _COMPILED = compiled_cache.load(COMPILED_CACHE_PATH, _SOURCE_HASH)
+
+CATALOGUE: CompiledCatalogue = _COMPILED["catalogue"] if _COMPILED else load_catalogue(CATALOGUE_PATH)
+
+VARIABLES = CATALOGUE.variables
 
 # Description lisible pour l'UI
-LABELS = {
-    "model": {
-        "compact": "Compact Urbain",
-        "suv": "SUV Trail",
-        "sport_gt": "Coupé GT",
-        "luxury_sedan": "Berline Luxe",
-    },
-    "engine": {
-        "petrol_1_6": "Essence 1.6L",
-        "petrol_2_0t": "Essence 2.0L Turbo",
-        "diesel_2_0": "Diesel 2.0L",
-        "hybrid_2_0": "Hybride 2.0L",
-        "electric_lr": "Électrique Long Range",
-    },
-    "transmission": {
-        "manual": "Manuelle 6 rapports",
-        "auto8": "Auto 8 rapports",
-    },
-    "drivetrain": {
-        "fwd": "Traction (FWD)",
-        "rwd": "Propulsion (RWD)",
-        "awd": "Transmission intégrale (AWD)",
-    },
-    "color": {
-        "white": "Blanc Nacré",
-        "black": "Noir Onyx",
-        "red": "Rouge Carmin",
-        "blue": "Bleu Horizon",
-        "silver": "Gris Argent",
-    },
-    "interior": {
-        "cloth": "Tissu",
-        "leather": "Cuir",
-        "alcantara": "Alcantara",
-    },
-    "pack": {
-        "none": "Aucun pack",
-        "tech": "Pack Tech",
-        "premium": "Pack Premium",
-        "offroad": "Pack Offroad",
-        "performance": "Pack Performance",
-    },
-}
+LABELS = CATALOGUE.labels
 
 
 def build_index_maps():
@@ -72,15 +56,12 @@ def build_index_maps():
 INDEX = build_index_maps()
 
 
-def _build_model(assignments: Dict[str, Optional[str]]) -> Tuple[cp_model.CpModel, Dict[str, cp_model.IntVar]]:
-    model = cp_model.CpModel()
-    vars_int = {}
-
-    # Création des variables CP-SAT (un IntVar par dimension)
-    for var_name, domain in VARIABLES.items():
-        vars_int[var_name] = model.NewIntVar(0, len(domain) - 1, var_name)
-
-    # Affectations partielles
+def chosen_indices(assignments: Dict[str, Optional[str]]) -> Dict[str, int]:
+    """
+    Ne garde que les choix exploitables (variable et valeur connues),
+    convertis en indices.
+    """
+    chosen = {}
     for var_name, value in assignments.items():
         if value is None or value == "":
             continue
@@ -88,136 +69,86 @@ def _build_model(assignments: Dict[str, Optional[str]]) -> Tuple[cp_model.CpMode
             continue
         if value not in INDEX[var_name]:
             continue
-        model.Add(vars_int[var_name] == INDEX[var_name][value])
-
-    # -------------------------
-    # Contraintes métier
-    # -------------------------
-
-    m = vars_int["model"]
-    e = vars_int["engine"]
-    t = vars_int["transmission"]
-    d = vars_int["drivetrain"]
-    c = vars_int["color"]
-    i = vars_int["interior"]
-    p = vars_int["pack"]
-
-    # Raccourcis pour indices
-    M = INDEX["model"]
-    E = INDEX["engine"]
-    T = INDEX["transmission"]
-    D = INDEX["drivetrain"]
-    C = INDEX["color"]
-    I = INDEX["interior"]
-    P = INDEX["pack"]
-
-    # -------------------------
-    # Règles métier réalistes
-    # -------------------------
-
-    # Compact : moteur 1.6/2.0t/hybride, pas AWD, pas Alcantara, pas offroad/performance
-    model.AddForbiddenAssignments(
-        [m, e],
-        [
-            (M["compact"], E["diesel_2_0"]),
-            (M["compact"], E["electric_lr"]),
-        ],
-    )
-    model.AddForbiddenAssignments([m, d], [(M["compact"], D["awd"])])
-    model.AddForbiddenAssignments([m, i], [(M["compact"], I["alcantara"])])
-    model.AddForbiddenAssignments([m, p], [(M["compact"], P["offroad"]), (M["compact"], P["performance"])])
-    # Hybride compact uniquement en auto
-    model.AddForbiddenAssignments([m, e, t], [(M["compact"], E["hybrid_2_0"], T["manual"])])
-
-    # SUV : auto obligatoire, moteurs 2.0t / diesel / hybrid, pas performance
-    model.AddForbiddenAssignments([m, t], [(M["suv"], T["manual"])])
-    model.AddForbiddenAssignments([m, e], [(M["suv"], E["petrol_1_6"])])
-    model.AddForbiddenAssignments([m, p], [(M["suv"], P["performance"])])
-    # Offroad uniquement pour SUV et nécessite AWD
-    model.AddForbiddenAssignments([p, m], [(P["offroad"], M["compact"]), (P["offroad"], M["sport_gt"]), (P["offroad"], M["luxury_sedan"])])
-    model.AddForbiddenAssignments([p, d], [(P["offroad"], D["fwd"]), (P["offroad"], D["rwd"])])
-
-    # Sport GT : auto, RWD/AWD, moteurs 2.0t ou électrique, pas cloth, pas offroad, au moins Tech
-    model.AddForbiddenAssignments([m, t], [(M["sport_gt"], T["manual"])])
-    model.AddForbiddenAssignments([m, d], [(M["sport_gt"], D["fwd"])])
-    model.AddForbiddenAssignments([m, i], [(M["sport_gt"], I["cloth"])])
-    model.AddForbiddenAssignments([m, p], [(M["sport_gt"], P["none"]), (M["sport_gt"], P["offroad"])])
-    model.AddForbiddenAssignments(
-        [m, e],
-        [
-            (M["sport_gt"], E["petrol_1_6"]),
-            (M["sport_gt"], E["diesel_2_0"]),
-            (M["sport_gt"], E["hybrid_2_0"]),
-        ],
-    )
+        chosen[var_name] = INDEX[var_name][value]
+    return chosen
 
-    # Luxury Sedan : auto, RWD/AWD, moteurs 2.0t/hybride/électrique, pas cloth, pack >= Tech, pas offroad/performance
-    model.AddForbiddenAssignments([m, t], [(M["luxury_sedan"], T["manual"])])
-    model.AddForbiddenAssignments([m, d], [(M["luxury_sedan"], D["fwd"])])
-    model.AddForbiddenAssignments([m, i], [(M["luxury_sedan"], I["cloth"])])
-    model.AddForbiddenAssignments(
-        [m, e],
-        [
-            (M["luxury_sedan"], E["petrol_1_6"]),
-            (M["luxury_sedan"], E["diesel_2_0"]),
-        ],
-    )
-    model.AddForbiddenAssignments([m, p], [(M["luxury_sedan"], P["none"]), (M["luxury_sedan"], P["offroad"]), (M["luxury_sedan"], P["performance"])])
-
-    # Electric LR : auto, AWD, pas cloth, pas offroad/performance, seulement GT ou Luxury
-    model.AddForbiddenAssignments([e, t], [(E["electric_lr"], T["manual"])])
-    model.AddForbiddenAssignments([e, d], [(E["electric_lr"], D["fwd"]), (E["electric_lr"], D["rwd"])])
-    model.AddForbiddenAssignments([e, i], [(E["electric_lr"], I["cloth"])])
-    model.AddForbiddenAssignments([e, p], [(E["electric_lr"], P["offroad"]), (E["electric_lr"], P["performance"])])
-    model.AddForbiddenAssignments(
-        [m, e],
-        [
-            (M["compact"], E["electric_lr"]),
-            (M["suv"], E["electric_lr"]),
-        ],
-    )
 
-    # Petrol 1.6 : uniquement sur compact
-    model.AddForbiddenAssignments(
-        [m, e],
-        [
-            (M["suv"], E["petrol_1_6"]),
-            (M["sport_gt"], E["petrol_1_6"]),
-            (M["luxury_sedan"], E["petrol_1_6"]),
-        ],
-    )
+def canonical_assignments(assignments: Dict[str, Optional[str]]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Forme canonique (triée, sans choix ignorés) d'une affectation partielle,
+    utilisée comme clé de cache.
+    """
+    return tuple(sorted((name, VARIABLES[name][idx]) for name, idx in chosen_indices(assignments).items()))
+
+
+# Empreinte du catalogue et des règles compilées : change dès qu'une règle
+# ou une valeur de VARIABLES change, et invalide alors les caches.
+RULES_HASH = CATALOGUE.rules_hash
+
+# Table des configurations valides, compilée une fois au démarrage.
+# None si le catalogue est trop grand pour être énuméré.
+TABLE: Optional[ConfigTable] = _COMPILED["table"] if _COMPILED else ConfigTable.from_catalogue(CATALOGUE)
+
+# Explication des conflits (QuickXplain sur la table, ou CP-SAT sans table)
+EXPLAINER = ConflictExplainer(CATALOGUE, TABLE)
+
+# Propagateur GAC en Python pur, utilisé sans CP-SAT quand la table n'existe pas
+GAC = GacPropagator(VARIABLES, CATALOGUE.tables)
+
+def _option_masks(chosen: Dict[str, int]) -> Optional[List[int]]:
+    if TABLE is not None:
+        domains, is_consistent = TABLE.propagate(chosen)
+        if not is_consistent:
+            return None
+        return [sum(1 << INDEX[name][value] for value in domains[name]) for name in VARIABLES]
+    return GAC.arc_consistency(chosen)
 
-    # Diesel : pas sur GT ni Luxury
-    model.AddForbiddenAssignments([m, e], [(M["sport_gt"], E["diesel_2_0"]), (M["luxury_sedan"], E["diesel_2_0"])])
 
-    # AWD toujours en auto8
-    model.AddForbiddenAssignments([d, t], [(D["awd"], T["manual"])])
+# Implications et exclusions de chaque option seule (voir implications.py)
+IMPLICATIONS = ImplicationMatrix(VARIABLES, _option_masks, _COMPILED["implications"] if _COMPILED else None)
 
-    # Premium requiert auto8
-    model.AddForbiddenAssignments([p, t], [(P["premium"], T["manual"])])
+if _COMPILED is None:
+    compiled_cache.save(
+        COMPILED_CACHE_PATH,
+        _SOURCE_HASH,
+        {"catalogue": CATALOGUE, "table": TABLE, "implications": IMPLICATIONS.masks},
+    )
+
+# Treillis précalculé (voir lattice.py), partagé entre workers via mmap.
+# Ignoré s'il est absent ou généré pour d'autres règles (les prix et poids
+# n'entrent pas dans son empreinte).
+LATTICE_PATH = os.environ.get("CONFIGURATOR_LATTICE", os.path.join(BASE_DIR, "lattice.bin"))
+LATTICE: Optional[Lattice] = Lattice.open(LATTICE_PATH, VARIABLES, CATALOGUE.tables_hash)
+
+CACHE_MAX_ENTRIES = 4096
+CACHE_TTL_SECONDS = 600.0
 
-    # Performance uniquement sur Sport GT et auto8
-    model.AddForbiddenAssignments([p, m], [(P["performance"], M["compact"]), (P["performance"], M["suv"]), (P["performance"], M["luxury_sedan"])])
-    model.AddForbiddenAssignments([p, t], [(P["performance"], T["manual"])])
+PROPAGATION_CACHE = ResultCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, RULES_HASH)
+SOLVE_CACHE = ResultCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, RULES_HASH)
 
-    # Tech requis pour Sport GT et Luxury
-    model.AddForbiddenAssignments([m, p], [(M["sport_gt"], P["none"]), (M["luxury_sedan"], P["none"])])
 
-    # Couleur rouge non disponible pour Luxury
-    model.AddForbiddenAssignments([m, c], [(M["luxury_sedan"], C["red"])])
+def cache_stats() -> Dict[str, Dict]:
+    return {
+        "propagate": PROPAGATION_CACHE.stats(),
+        "solve": SOLVE_CACHE.stats(),
+        "explanations": EXPLAINER.stats(),
+        "sessions": SESSIONS.stats(),
+    }
 
-    return model, vars_int
 
+def _cache_metrics() -> List[str]:
+    samples = []
+    for name, cache in (("propagate", PROPAGATION_CACHE), ("solve", SOLVE_CACHE)):
+        stats = cache.stats()
+        for event in ("hits", "misses", "evictions", "expirations"):
+            samples.append(({"cache": name, "event": event}, stats[event]))
+    explanations = EXPLAINER.stats()
+    for event in ("hits", "misses"):
+        samples.append(({"cache": "explanations", "event": event}, explanations[event]))
+    return metrics.format_samples("configurator_cache_events_total", "Événements des caches", "counter", samples)
 
-class DomainCollector(cp_model.CpSolverSolutionCallback):
-    def __init__(self, variables: Dict[str, cp_model.IntVar]):
-        super().__init__()
-        self._vars = variables
-        self.domains: Dict[str, Set[int]] = {name: set() for name in variables}
 
-    def on_solution_callback(self):
-        for name, var in self._vars.items():
-            self.domains[name].add(self.Value(var))
+metrics.register_collector("cache", _cache_metrics)
 
 
 def propagate_domains(assignments: Dict[str, Optional[str]]):
@@ -225,54 +156,244 @@ def propagate_domains(assignments: Dict[str, Optional[str]]):
     Retourne, pour chaque variable, l'ensemble des valeurs encore possibles
     en tenant compte des contraintes ET des affectations partielles.
     """
-    model, vars_int = _build_model(assignments)
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 5.0
-    solver.parameters.num_search_workers = 8
+    key = canonical_assignments(assignments)
+    # Résultat incomplet (limite de temps CP-SAT) : recalculé au prochain appel
+    domains, is_consistent, _ = PROPAGATION_CACHE.get_or_compute(
+        key, lambda: _propagate(dict(key)), lambda result: result[2]
+    )
+    # Copie : le résultat en cache ne doit pas être modifié par l'appelant
+    return {name: list(values) for name, values in domains.items()}, is_consistent
 
-    # Pour chaque variable et chaque valeur possible, on teste s'il existe
-    # au moins une solution complète en ajoutant la contrainte var == value.
-    # C'est plus simple et robuste que SearchForAllSolutions pour obtenir
-    # les domaines accessibles (taille du problème très réduite ici).
-    domains: Dict[str, List[str]] = {name: [] for name in VARIABLES}
-    is_consistent = False
 
-    for var_name, values in VARIABLES.items():
-        for idx in range(len(values)):
-            # Reconstruire un modèle propre pour chaque test
-            test_model, test_vars = _build_model(assignments)
-            test_model.Add(test_vars[var_name] == idx)
+def group_assignments(
+    batch: List[Dict[str, Optional[str]]]
+) -> List[Tuple[Tuple[Tuple[str, str], ...], List[int]]]:
+    """
+    Dédoublonne un lot d'affectations : (forme canonique, positions dans le lot).
+    """
+    groups: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+    for position, assignments in enumerate(batch):
+        groups.setdefault(canonical_assignments(assignments), []).append(position)
+    return list(groups.items())
 
-            test_solver = cp_model.CpSolver()
-            test_solver.parameters.max_time_in_seconds = 0.5
-            test_solver.parameters.num_search_workers = 8
 
-            status = test_solver.Solve(test_model)
-            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-                domains[var_name].append(values[idx])
-                is_consistent = True
+def propagate_domains_batch(
+    batch: List[Dict[str, Optional[str]]]
+) -> Iterator[Tuple[List[int], Dict[str, List[str]], bool]]:
+    """
+    Propage un lot d'affectations partielles. Chaque affectation distincte
+    n'est calculée qu'une fois ; les résultats sont produits au fil de l'eau
+    sous la forme (positions dans le lot, domaines, cohérent).
+    """
+    for key, positions in group_assignments(batch):
+        domains, is_consistent = propagate_domains(dict(key))
+        yield positions, domains, is_consistent
+
 
-    return domains, is_consistent
+def propagate_with_counts(
+    assignments: Dict[str, Optional[str]]
+) -> Tuple[Dict[str, List[str]], bool, Optional[Dict[str, Dict[str, int]]]]:
+    """
+    Comme propagate_domains, avec en plus le nombre de configurations
+    complètes auquel mène chaque valeur restante, calculé dans la même passe
+    sur la table. Sans table, les comptes valent None.
+    """
+    if TABLE is None:
+        domains, is_consistent = propagate_domains(assignments)
+        return domains, is_consistent, None
+    with metrics.span("support_counts"):
+        counts = TABLE.support_counts(chosen_indices(assignments))
+    domains = {name: list(value_counts) for name, value_counts in counts.items()}
+    is_consistent = any(domains.values())
+    return domains, is_consistent, counts
 
 
-def solve_configuration(assignments: Dict[str, Optional[str]]):
+# Sessions de configuration à propagation incrémentale
+SESSIONS = SessionStore(VARIABLES, TABLE, propagate_domains)
+
+# Autres catalogues (marques, millésimes) : <id>.json dans CATALOGUE_DIR,
+# chargés à la demande ; "default" désigne le catalogue principal.
+CATALOGUE_DIR = os.environ.get("CONFIGURATOR_CATALOGUE_DIR", os.path.join(BASE_DIR, "catalogues"))
+CATALOGUES = CatalogueRegistry(CATALOGUE_DIR, extra={"default": CATALOGUE_PATH}, search_workers=NUM_SEARCH_WORKERS)
+CATALOGUES.preload("default", CATALOGUE_PATH, CATALOGUE, TABLE, GAC, IMPLICATIONS)
+
+
+def propagate_catalogue(catalogue_id: str, assignments: Dict[str, Optional[str]], with_counts: bool = False) -> Dict[str, Any]:
+    """
+    Propagation sur un catalogue du registre (KeyError s'il n'existe pas,
+    ValueError s'il est invalide).
+    """
+    return CATALOGUES.get(catalogue_id).propagate(assignments, with_counts)
+
+
+def explain_conflict(assignments: Dict[str, Optional[str]]) -> Optional[Dict]:
+    """
+    None si les choix sont cohérents ; sinon un sous-ensemble minimal des
+    choix en conflit et les règles du catalogue qui l'expliquent.
+    """
+    with metrics.span("explain"):
+        return EXPLAINER.explain(chosen_indices(assignments), NUM_SEARCH_WORKERS)
+
+
+def propagation_needs_solver() -> bool:
+    """
+    Vrai si propagate_domains peut devoir lancer une recherche (GAC ou CP-SAT),
+    faux si elle se résume à une lecture du treillis ou de la table.
+    """
+    return LATTICE is None and TABLE is None
+
+
+def rejected_by_implications(assignments: Dict[str, Optional[str]]) -> bool:
+    """
+    Vrai si deux choix s'excluent d'après la matrice d'implications :
+    l'affectation est incohérente, inutile de lancer un solveur.
+    """
+    return IMPLICATIONS.candidates(chosen_indices(assignments)) is None
+
+
+def _propagate(assignments: Dict[str, Optional[str]]):
+    """
+    (domaines, cohérent, complet) : `complet` est faux si une résolution
+    CP-SAT n'a pas conclu dans sa limite de temps (domaines sur-ensembles).
+    """
+    chosen = chosen_indices(assignments)
+    if LATTICE is not None:
+        with metrics.span("propagate_lattice"):
+            return (*LATTICE.propagate(chosen), True)
+    if TABLE is not None:
+        with metrics.span("propagate_table"):
+            return (*TABLE.propagate(chosen), True)
+    # Même chemin que les catalogues du registre sans table
+    return propagate_without_table(CATALOGUE, GAC, IMPLICATIONS, chosen, NUM_SEARCH_WORKERS)
+
+
+def count_configurations(assignments: Dict[str, Optional[str]]) -> Optional[int]:
+    """
+    Nombre de configurations complètes encore possibles (popcount sur la table).
+    None si le catalogue est trop grand pour la table.
+    """
+    if TABLE is None:
+        return None
+    return TABLE.count(chosen_indices(assignments))
+
+
+def list_configurations(
+    assignments: Dict[str, Optional[str]], offset: int = 0, limit: int = 50
+) -> Optional[Tuple[int, List[Dict[str, str]]]]:
+    """
+    (total, page) des configurations complètes encore possibles.
+    None si le catalogue est trop grand pour la table.
+    """
+    if TABLE is None:
+        return None
+    chosen = chosen_indices(assignments)
+    return TABLE.count(chosen), TABLE.configurations(chosen, offset, limit)
+
+
+# Objectifs acceptés par solve_configuration
+OBJECTIVES = ("any", "cheapest", "premium", "closest")
+
+SOLVE_TIME_LIMIT_SECONDS = 1.0
+
+
+def configuration_price(config: Dict[str, str]) -> int:
+    return sum(CATALOGUE.prices[name][value] for name, value in config.items() if name in CATALOGUE.prices)
+
+
+def _proven(result: Tuple[Optional[Dict[str, str]], str]) -> bool:
+    """
+    Vrai si un résultat de résolution est définitif et peut aller en cache :
+    optimum ou infaisabilité prouvés. Une solution "FEASIBLE" (limite de temps
+    atteinte avant la preuve) pourrait être améliorée par un nouvel appel.
+    """
+    return result[1] in ("OPTIMAL", "INFEASIBLE")
+
+
+def solve_configuration(
+    assignments: Dict[str, Optional[str]],
+    objective: str = "any",
+    reference: Optional[Dict[str, Optional[str]]] = None,
+    hint: Optional[Dict[str, Optional[str]]] = None,
+):
     """
     Tente de trouver une configuration complète compatible avec les choix partiels.
+
+    - "any" : n'importe quelle configuration valide ;
+    - "cheapest" / "premium" : prix total minimal / maximal ;
+    - "closest" : distance pondérée (poids du catalogue) minimale à `reference`.
+
+    `hint` (typiquement la dernière solution de l'utilisateur) sert de point de
+    départ à CP-SAT ; il n'influe pas sur la valeur optimale, donc pas sur le cache.
+    Seuls les résultats définitifs sont gardés en cache : toute solution pour
+    "any", l'optimum prouvé pour les autres objectifs.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objectif inconnu : {objective}")
+    key = (
+        canonical_assignments(assignments),
+        objective,
+        canonical_assignments(reference or {}) if objective == "closest" else (),
+    )
+    config, status = SOLVE_CACHE.get_or_compute(
+        key,
+        lambda: _solve(dict(key[0]), objective, dict(key[2]), hint or {}),
+        lambda result: _proven(result) or (objective == "any" and result[1] == "FEASIBLE"),
+    )
+    return (dict(config) if config is not None else None), status
+
+
+def _solve(
+    assignments: Dict[str, Optional[str]],
+    objective: str = "any",
+    reference: Optional[Dict[str, Optional[str]]] = None,
+    hint: Optional[Dict[str, Optional[str]]] = None,
+):
+    # Chemin rapide : la première configuration valide de la table sert de témoin
+    if objective == "any" and TABLE is not None:
+        with metrics.span("solve_table"):
+            mask = TABLE.restrict(chosen_indices(assignments))
+            if not mask:
+                return None, "INFEASIBLE"
+            return TABLE.decode((mask & -mask).bit_length() - 1), "FEASIBLE"
+
+    return cpsat_engine.optimize(
+        CATALOGUE,
+        chosen_indices(assignments),
+        objective,
+        chosen_indices(reference or {}),
+        chosen_indices(hint or {}),
+        NUM_SEARCH_WORKERS,
+        SOLVE_TIME_LIMIT_SECONDS,
+    )
+
+
+# Réparation de choix incohérents : exacte sur la table, CP-SAT sinon
+# (threads CP-SAT lus à chaque appel : pool._worker_init modifie NUM_SEARCH_WORKERS après l'import)
+REPAIRER = ConfigurationRepairer(CATALOGUE, TABLE, NUM_SEARCH_WORKERS, SOLVE_TIME_LIMIT_SECONDS)
+
+
+def repair_weights(assignments: Dict[str, Optional[str]], history: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Coût de modification de chaque choix exploitable (voir repair.recency_weights).
     """
-    model, vars_int = _build_model(assignments)
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 5.0
-    solver.parameters.num_search_workers = 8
+    return recency_weights(CATALOGUE, chosen_indices(assignments), history)
 
-    status = solver.Solve(model)
 
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return None, "INFEASIBLE"
+def repair_configuration(
+    assignments: Dict[str, Optional[str]],
+    history: Optional[List[str]] = None,
+) -> Tuple[Optional[Dict[str, str]], str]:
+    """
+    Configuration complète valide qui modifie le moins de choix possible
+    (pondérés par le catalogue et, avec `history`, par leur ancienneté).
+    """
+    chosen = chosen_indices(assignments)
+    weights = repair_weights(assignments, history)
+    key = ("repair", canonical_assignments(assignments), tuple(sorted(weights.items())))
+    with metrics.span("repair"):
+        config, status = SOLVE_CACHE.get_or_compute(key, lambda: REPAIRER.repair(chosen, weights, NUM_SEARCH_WORKERS), _proven)
+    return (dict(config) if config is not None else None), status
 
-    # Récupération d'une solution
-    result: Dict[str, str] = {}
-    for var_name, var in vars_int.items():
-        idx = solver.Value(var)
-        result[var_name] = VARIABLES[var_name][idx]
 
-    return result, "FEASIBLE"
+# Validation en masse de commandes (orders.py), réparées par repair_configuration
+ORDERS = OrderValidator(CATALOGUE, TABLE, propagate_domains, repair_configuration)
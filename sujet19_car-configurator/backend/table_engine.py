@@ -0,0 +1,165 @@
+"""
+Moteur de propagation par table compilée.
+
+Le catalogue est assez petit pour être énuméré : on compile une fois pour
+toutes les règles du catalogue en un *bitset* des configurations
+complètes valides (un entier Python dont le bit k représente la k-ième
+configuration, numérotée en base mixte). La propagation d'une affectation
+partielle se réduit alors à quelques ET binaires.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from rules import CompiledCatalogue
+
+
+# Au-delà de ce nombre de configurations complètes, on ne compile pas la
+# table et on laisse CP-SAT répondre.
+MAX_TABLE_SIZE = 500_000
+
+# (positions des variables, combinaisons interdites)
+TableConstraint = Tuple[List[int], List[Tuple[int, ...]]]
+
+
+def _repeat_block(block: int, period: int, count: int) -> int:
+    """
+    Répète `block` tous les `period` bits, `count` fois (par doublements successifs).
+    """
+    mask, reps = 0, 0
+    chunk, chunk_reps = block, 1
+    while count:
+        if count & 1:
+            mask |= chunk << (reps * period)
+            reps += chunk_reps
+        chunk |= chunk << (chunk_reps * period)
+        chunk_reps *= 2
+        count >>= 1
+    return mask
+
+
+class ConfigTable:
+    """
+    Ensemble des configurations complètes valides, sous forme de bitset.
+    """
+
+    def __init__(self, variables: Dict[str, List[str]], constraints: List[TableConstraint]):
+        self.variables = variables
+        self.names = list(variables)
+        self.sizes = [len(variables[name]) for name in self.names]
+
+        # Base mixte : la dernière variable varie le plus vite
+        self.strides = [1] * len(self.sizes)
+        for k in range(len(self.sizes) - 2, -1, -1):
+            self.strides[k] = self.strides[k + 1] * self.sizes[k + 1]
+        self.size = self.strides[0] * self.sizes[0] if self.sizes else 1
+        self.full = (1 << self.size) - 1
+
+        # value_masks[k][v] : configurations où la variable k vaut v
+        self.value_masks: List[List[int]] = []
+        for k, n in enumerate(self.sizes):
+            stride = self.strides[k]
+            period = stride * n
+            run = (1 << stride) - 1
+            self.value_masks.append(
+                [_repeat_block(run << (v * stride), period, self.size // period) for v in range(n)]
+            )
+
+        self.valid = self.full
+        for scope, tuples in constraints:
+            self.valid &= ~self.tuples_mask(scope, tuples)
+
+    def tuples_mask(self, scope: Sequence[int], tuples: Sequence[Tuple[int, ...]]) -> int:
+        """
+        Bitset des configurations (valides ou non) qui contiennent l'un des tuples.
+        """
+        matched = 0
+        for tup in tuples:
+            mask = self.full
+            for k, v in zip(scope, tup):
+                mask &= self.value_masks[k][v]
+            matched |= mask
+        return matched
+
+    @classmethod
+    def from_catalogue(cls, catalogue: CompiledCatalogue) -> Optional["ConfigTable"]:
+        """
+        Compile les tables interdites d'un catalogue.
+        """
+        size = 1
+        for values in catalogue.variables.values():
+            size *= len(values)
+        if size > MAX_TABLE_SIZE:
+            return None
+        position = {name: k for k, name in enumerate(catalogue.variables)}
+        constraints = [([position[name] for name in scope], tuples) for scope, tuples in catalogue.tables]
+        return cls(catalogue.variables, constraints)
+
+    def restrict(self, chosen: Dict[str, int], base: Optional[int] = None) -> int:
+        """
+        Bitset des configurations valides compatibles avec les choix (indices).
+        `base` remplace l'ensemble des configurations valides si fourni.
+        """
+        mask = self.valid if base is None else base
+        for k, name in enumerate(self.names):
+            if name in chosen:
+                mask &= self.value_masks[k][chosen[name]]
+        return mask
+
+    def count(self, chosen: Dict[str, int]) -> int:
+        """
+        Nombre de configurations complètes compatibles avec les choix.
+        """
+        return self.restrict(chosen).bit_count()
+
+    def decode(self, k: int) -> Dict[str, str]:
+        """
+        Configuration complète correspondant au bit k.
+        """
+        return {
+            name: self.variables[name][(k // self.strides[p]) % self.sizes[p]]
+            for p, name in enumerate(self.names)
+        }
+
+    def configurations(self, chosen: Dict[str, int], offset: int, limit: int) -> List[Dict[str, str]]:
+        """
+        Page de configurations complètes compatibles, dans l'ordre de la base mixte.
+        """
+        mask = self.restrict(chosen)
+        page: List[Dict[str, str]] = []
+        position = 0
+        while mask and len(page) < limit:
+            low = mask & -mask
+            if position >= offset:
+                page.append(self.decode(low.bit_length() - 1))
+            mask ^= low
+            position += 1
+        return page
+
+    def support_counts(self, chosen: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        """
+        Pour chaque variable, nombre de configurations complètes compatibles
+        par valeur encore possible (les valeurs à 0 sont omises).
+        """
+        mask = self.restrict(chosen)
+        counts: Dict[str, Dict[str, int]] = {}
+        for k, name in enumerate(self.names):
+            values = self.variables[name]
+            counts[name] = {}
+            for v, vm in enumerate(self.value_masks[k]):
+                n = (mask & vm).bit_count()
+                if n:
+                    counts[name][values[v]] = n
+        return counts
+
+    def propagate(self, chosen: Dict[str, int]) -> Tuple[Dict[str, List[str]], bool]:
+        """
+        Même résultat que la boucle de faisabilité valeur par valeur de CP-SAT.
+        """
+        return self.domains_from_mask(self.restrict(chosen))
+
+    def domains_from_mask(self, mask: int) -> Tuple[Dict[str, List[str]], bool]:
+        domains: Dict[str, List[str]] = {}
+        for k, name in enumerate(self.names):
+            values = self.variables[name]
+            domains[name] = [values[v] for v, vm in enumerate(self.value_masks[k]) if mask & vm]
+        return domains, mask != 0
@@ -1,5 +1,7 @@
 // URL de l'API FastAPI
 const API_BASE = "http://127.0.0.1:8000";
+// Canal temps réel (voir backend/realtime.py) ; repli sur fetch s'il est indisponible
+const WS_URL = API_BASE.replace(/^http/, "ws") + "/ws";
 
 // Description des variables (pour garder la correspondance avec le backend)
 const VARIABLES = [
@@ -12,56 +14,23 @@ const VARIABLES = [
   "pack",
 ];
 
-// Labels lisibles (doivent être cohérents avec solver.py)
-const LABELS = {
-  model: {
-    compact: "Compact Urbain",
-    suv: "SUV Trail",
-    sport_gt: "Coupé GT",
-    luxury_sedan: "Berline Luxe",
-  },
-  engine: {
-    petrol_1_6: "Essence 1.6L",
-    petrol_2_0t: "Essence 2.0L Turbo",
-    diesel_2_0: "Diesel 2.0L",
-    hybrid_2_0: "Hybride 2.0L",
-    electric_lr: "Électrique Long Range",
-  },
-  transmission: {
-    manual: "Manuelle 6 rapports",
-    auto8: "Auto 8 rapports",
-  },
-  drivetrain: {
-    fwd: "Traction (FWD)",
-    rwd: "Propulsion (RWD)",
-    awd: "Transmission intégrale (AWD)",
-  },
-  color: {
-    white: "Blanc Nacré",
-    black: "Noir Onyx",
-    red: "Rouge Carmin",
-    blue: "Bleu Horizon",
-    silver: "Gris Argent",
-  },
-  interior: {
-    cloth: "Tissu",
-    leather: "Cuir",
-    alcantara: "Alcantara",
-  },
-  pack: {
-    none: "Aucun pack",
-    tech: "Pack Tech",
-    premium: "Pack Premium",
-    offroad: "Pack Offroad",
-    performance: "Pack Performance",
-  },
-};
+// Labels lisibles, chargés depuis GET /catalogue (source unique : backend/catalogue.json)
+let LABELS = {};
+// Exclusions de chaque option seule, chargées depuis GET /implications
+let IMPLICATIONS = {};
+let DEAD_OPTIONS = {};
+// Dictionnaire de l'encodage compact des domaines (voir backend/domain_codec.py)
+const DOMAINS_MEDIA_TYPE = "application/x-configurator-domains";
+let DOMAIN_DICTIONARY = null;
 
 const form = document.getElementById("config-form");
 const statusEl = document.getElementById("status");
 const solutionEl = document.getElementById("solution");
 const solveBtn = document.getElementById("solve-btn");
 const resetBtn = document.getElementById("reset-btn");
+const objectiveEl = document.getElementById("objective");
+// Dernière solution trouvée : référence pour "closest" et point de départ du solveur
+let lastSolution = null;
 const carBadge = document.getElementById("car-badge");
 const carDetails = document.getElementById("car-details");
 const BRANDS = {
@@ -282,7 +251,7 @@ function updateCarPreview(assignments) {
 }
 
 // Met à jour les options des selects en fonction des domaines renvoyés
-function updateSelects(domains, valid, assignments = {}) {
+function updateSelects(domains, valid, assignments = {}, counts = null) {
   VARIABLES.forEach((v) => {
     const select = document.getElementById(v);
     const previousValue = select.value || "";
@@ -305,6 +274,11 @@ function updateSelects(domains, valid, assignments = {}) {
       const opt = document.createElement("option");
       opt.value = value;
       opt.textContent = label;
+      // Nombre de configurations complètes auxquelles mène cette option
+      const count = counts && counts[v] ? counts[v][value] : undefined;
+      if (count !== undefined && value !== currentAssignment) {
+        opt.textContent = `${label} (${count} version${count > 1 ? "s" : ""})`;
+      }
 
       if (!allowed.has(value)) {
         opt.disabled = true;
@@ -337,19 +311,189 @@ function updateSelects(domains, valid, assignments = {}) {
   updateCarPreview(assignments);
 }
 
-// Appel API /propagate
+// Appel API /catalogue : récupère les libellés des options
+async function loadCatalogue() {
+  try {
+    const res = await fetch(`${API_BASE}/catalogue`);
+    if (!res.ok) return;
+    const data = await res.json();
+    LABELS = data.labels || {};
+    DOMAIN_DICTIONARY = data.dictionary || null;
+  } catch (err) {
+    console.error(err);
+  }
+  loadImplications();
+}
+
+// Appel API /implications : permet de griser les options sans attendre le serveur
+async function loadImplications() {
+  try {
+    const res = await fetch(`${API_BASE}/implications`);
+    if (!res.ok) return;
+    const data = await res.json();
+    IMPLICATIONS = data.implications || {};
+    DEAD_OPTIONS = data.dead || {};
+  } catch (err) {
+    console.error(err);
+  }
+}
+
+// Grise tout de suite les options exclues par un des choix courants ;
+// la réponse de /propagate (plus précise) reconstruit ensuite les selects
+function applyLocalHints(assignments) {
+  VARIABLES.forEach((v) => {
+    const excluded = new Set(DEAD_OPTIONS[v] || []);
+    Object.entries(assignments).forEach(([other, value]) => {
+      if (other === v || !value) return;
+      const impact = IMPLICATIONS[other] && IMPLICATIONS[other][value];
+      if (impact && impact.excludes[v]) impact.excludes[v].forEach((x) => excluded.add(x));
+    });
+    const select = document.getElementById(v);
+    Array.from(select.options).forEach((opt) => {
+      if (opt.value && excluded.has(opt.value)) {
+        opt.disabled = true;
+        opt.classList.add("disabled-option");
+      }
+    });
+  });
+}
+
+// Canal WebSocket : le serveur garde les choix et n'envoie que les différences
+let socket = null;
+let liveDomains = null;
+let liveCounts = null;
+let sentSeq = 0;
+
+function connectLive() {
+  let ws;
+  try {
+    ws = new WebSocket(WS_URL);
+  } catch (err) {
+    console.error(err);
+    propagate();
+    return;
+  }
+  ws.onopen = () => {
+    socket = ws;
+    sentSeq = 0;
+    liveDomains = null;
+  };
+  ws.onmessage = (event) => handleLive(JSON.parse(event.data));
+  ws.onclose = () => {
+    const wasOpen = socket === ws;
+    socket = null;
+    // Jamais ouvert (backend sans WebSocket) ou coupé : retour aux appels fetch
+    if (!wasOpen || liveDomains === null) propagate();
+  };
+}
+
+function handleLive(msg) {
+  if (msg.type === "error") {
+    console.warn(msg.detail);
+    return;
+  }
+  if (msg.type === "state") {
+    liveDomains = msg.domains;
+    liveCounts = msg.counts;
+  } else if (msg.type === "diff" && liveDomains) {
+    Object.entries(msg.removed).forEach(([v, values]) => {
+      liveDomains[v] = liveDomains[v].filter((value) => !values.includes(value));
+      if (liveCounts && liveCounts[v]) values.forEach((value) => delete liveCounts[v][value]);
+    });
+    Object.entries(msg.added).forEach(([v, values]) => {
+      liveDomains[v] = liveDomains[v].concat(values);
+    });
+    if (liveCounts) {
+      Object.entries(msg.counts).forEach(([v, counts]) => {
+        liveCounts[v] = Object.assign(liveCounts[v] || {}, counts);
+      });
+    }
+  } else {
+    return;
+  }
+  // Résultat intermédiaire (l'utilisateur a déjà changé autre chose) : on attend le suivant
+  if (msg.seq !== sentSeq) return;
+  updateSelects(liveDomains, msg.valid, msg.assignments, liveCounts);
+  if (!msg.valid) {
+    explainConflict(msg.assignments);
+  }
+}
+
+// Décode une réponse compacte de /propagate : version (8 octets), drapeaux,
+// un masque de bits par variable, puis les compteurs en LEB128.
+// Renvoie null si le dictionnaire chargé n'est pas celui du serveur.
+function decodeDomains(buffer) {
+  const bytes = new Uint8Array(buffer);
+  const version = Array.from(bytes.subarray(0, 8), (b) => b.toString(16).padStart(2, "0")).join("");
+  if (!DOMAIN_DICTIONARY || version !== DOMAIN_DICTIONARY.version) return null;
+  const flags = bytes[8];
+  let pos = 9;
+  const domains = {};
+  DOMAIN_DICTIONARY.variables.forEach(([name, values]) => {
+    const width = Math.ceil(values.length / 8);
+    domains[name] = values.filter((_, i) => bytes[pos + (i >> 3)] & (1 << (i & 7)));
+    pos += width;
+  });
+  let counts = null;
+  if (flags & 2) {
+    counts = {};
+    DOMAIN_DICTIONARY.variables.forEach(([name]) => {
+      counts[name] = {};
+      domains[name].forEach((value) => {
+        let n = 0;
+        let scale = 1;
+        let byte;
+        do {
+          byte = bytes[pos++];
+          n += (byte & 0x7f) * scale;
+          scale *= 128;
+        } while (byte & 0x80);
+        counts[name][value] = n;
+      });
+    });
+  }
+  return { domains, valid: Boolean(flags & 1), counts };
+}
+
+// Lit une réponse de /propagate, compacte ou JSON (null si dictionnaire périmé)
+async function readPropagation(res) {
+  const type = res.headers.get("Content-Type") || "";
+  if (type.startsWith(DOMAINS_MEDIA_TYPE)) {
+    return decodeDomains(await res.arrayBuffer());
+  }
+  return res.json();
+}
+
+// Appel API /propagate (ou envoi sur le canal WebSocket s'il est ouvert)
 async function propagate() {
   const assignments = getAssignments();
 
   // Toute modification annule la solution précédente
   solutionEl.textContent = "";
+  applyLocalHints(assignments);
+
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    sentSeq += 1;
+    socket.send(JSON.stringify({ type: "assign", assignments, seq: sentSeq }));
+    return;
+  }
 
   try {
-    const res = await fetch(`${API_BASE}/propagate`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ assignments }),
+    // GET cacheable : le navigateur (et un éventuel CDN) revalide par ETag
+    const params = new URLSearchParams({ with_counts: "true" });
+    Object.entries(assignments).forEach(([v, value]) => {
+      if (value) params.set(v, value);
     });
+    // Réponse en masques de bits si le dictionnaire de /catalogue est chargé
+    const headers = DOMAIN_DICTIONARY ? { Accept: DOMAINS_MEDIA_TYPE } : {};
+    let res = await fetch(`${API_BASE}/propagate?${params}`, { headers });
+    let data = res.ok ? await readPropagation(res) : null;
+    if (res.ok && !data) {
+      // Dictionnaire périmé (règles modifiées) : rechargement, puis JSON
+      loadCatalogue();
+      res = await fetch(`${API_BASE}/propagate?${params}`);
+      data = res.ok ? await res.json() : null;
+    }
 
     if (!res.ok) {
       statusEl.textContent = "Erreur lors de la propagation";
@@ -357,8 +501,10 @@ async function propagate() {
       return;
     }
 
-    const data = await res.json();
-    updateSelects(data.domains, data.valid, assignments);
+    updateSelects(data.domains, data.valid, assignments, data.counts);
+    if (!data.valid) {
+      explainConflict(assignments);
+    }
   } catch (err) {
     console.error(err);
     statusEl.textContent = "Impossible de contacter l'API (backend lancé ?)";
@@ -366,6 +512,30 @@ async function propagate() {
   }
 }
 
+// Appel API /explain : indique quels choix sont incompatibles entre eux
+async function explainConflict(assignments) {
+  try {
+    const res = await fetch(`${API_BASE}/explain`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ assignments }),
+    });
+    if (!res.ok) return;
+    const data = await res.json();
+    if (data.valid || !data.conflict) return;
+
+    const choices = Object.entries(data.conflict).map(([v, value]) => labelFor(v, value));
+    let message = `⚠️ Choix incompatibles : ${choices.join(" + ")}. Retirez l'un d'eux.`;
+    if (data.rules && data.rules.length) {
+      message += ` (Règle : ${data.rules.join(" ; ")})`;
+    }
+    statusEl.textContent = message;
+    statusEl.className = "status error";
+  } catch (err) {
+    console.error(err);
+  }
+}
+
 // Appel API /solve
 async function solve() {
   const assignments = getAssignments();
@@ -374,7 +544,12 @@ async function solve() {
     const res = await fetch(`${API_BASE}/solve`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ assignments }),
+      body: JSON.stringify({
+        assignments,
+        objective: objectiveEl.value,
+        reference: lastSolution,
+        hint: lastSolution,
+      }),
     });
 
     if (!res.ok) {
@@ -391,6 +566,7 @@ async function solve() {
 
     // Affichage lisible
     const config = data.configuration;
+    lastSolution = config;
     const lines = ["Configuration trouvée :"];
     VARIABLES.forEach((v) => {
       const value = config[v];
@@ -400,6 +576,9 @@ async function solve() {
           : value;
       lines.push(`- ${v} : ${label} (${value})`);
     });
+    if (data.price !== null && data.price !== undefined) {
+      lines.push(`Prix : ${fmtPrice(data.price)}`);
+    }
 
     solutionEl.textContent = lines.join("\n");
   } catch (err) {
@@ -448,4 +627,4 @@ document.querySelectorAll(".preset-card").forEach((el) => {
 
 // Initialisation
 initSelects();
-propagate();
+loadCatalogue().then(connectLive);